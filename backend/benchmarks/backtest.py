@@ -0,0 +1,152 @@
+# Offline backtest of the detectors: replays a recorded or synthetic event stream
+# through the analyser with an in-memory DetectionSink (no Mongo, no Groq) and reports
+# throughput, per-detector latency and, for labelled streams, precision and recall.
+#
+#   python -m benchmarks.workload --out workload.ndjson.gz
+#   python -m benchmarks.backtest workload.ndjson.gz
+#   python -m benchmarks.backtest --archive --start 2025-01-01 --end 2025-02-01 --labels bots.txt
+#
+# Events are labelled by their "label" field (anything but "normal" is a bot), as
+# written by benchmarks.workload, or by --labels: a file with one bot username per
+# line. Set SPAM_RULES_PATH to backtest another spam rule pack.
+import argparse
+import asyncio
+import datetime
+import gzip
+import logging
+import time
+from typing import Dict, Iterator, List, Set
+from bson import json_util
+from routers.analyser import replay_events
+from services import detectors_numpy
+from services.detections import DetectionSink
+from services.detectors import DETECTORS, epoch_micros, new_user_state
+from services.rate_detector import RateDetector
+from services.retention import read_archive
+
+JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS
+RATE_DETECTOR = "Streaming rate detector"
+
+def read_events(path: str) -> Iterator[dict]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json_util.loads(line, json_options=JSON_OPTIONS)
+
+def _percentile(samples: List[int], q: float) -> float:
+    return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+
+def time_detectors(events: List[dict]):
+    """
+    Runs every incremental detector and the streaming rate detector event by event,
+    timing each call separately.
+
+    Returns:
+        tuple: ({detector: users it flagged}, {detector: call durations in ns}).
+    """
+    states = {}
+    rate_detector = RateDetector(max_users=len(events) + 1)
+    flagged: Dict[str, Set[str]] = {reason: set() for reason in [*DETECTORS, RATE_DETECTOR]}
+    durations: Dict[str, List[int]] = {reason: [] for reason in flagged}
+    clock = time.perf_counter_ns
+    for event in events:
+        actor = event["actor"]
+        state = states.setdefault(actor, new_user_state())
+        ts_us, content = epoch_micros(event["ts"]), event.get("content")
+        for reason, check in DETECTORS.items():
+            if reason in state["flags"]:
+                continue
+            started = clock()
+            hit = check(state, ts_us, content)
+            durations[reason].append(clock() - started)
+            if hit:
+                state["flags"].append(reason)
+                flagged[reason].add(actor)
+        started = clock()
+        hit = rate_detector.observe(actor, ts_us / 1e6)
+        durations[RATE_DETECTOR].append(clock() - started)
+        if hit:
+            flagged[RATE_DETECTOR].add(actor)
+    return flagged, durations
+
+def time_vectorized(events: List[dict]) -> float:
+    started = time.perf_counter()
+    arrays = detectors_numpy.EventArrays()
+    arrays.extend([event["actor"] for event in events], [event["ts"] for event in events])
+    detectors_numpy.find_high_frequency_users(arrays)
+    detectors_numpy.find_time_pattern_users(arrays)
+    return time.perf_counter() - started
+
+def score(flagged: Set[str], bots: Set[str]) -> str:
+    hits = len(flagged & bots)
+    precision = hits / len(flagged) if flagged else 0.0
+    recall = hits / len(bots) if bots else 0.0
+    return f"{len(flagged):>8,} {hits:>6,} {precision:>9.3f} {recall:>7.3f}"
+
+def report(events: List[dict], bots: Set[str], labelled: bool, load_seconds: float):
+    users = {event["actor"] for event in events}
+    print(f"{len(events):,} events of {len(users):,} users loaded in {load_seconds:.2f}s")
+
+    sink = DetectionSink(collection=None)
+    started = time.perf_counter()
+    asyncio.run(replay_events(events, sink))
+    seconds = time.perf_counter() - started
+    print(f"analyser (incremental): {len(events) / seconds:,.0f} events/s, {len(sink.detections):,} users flagged")
+    seconds = time_vectorized(events)
+    print(f"analyser (vectorized window detectors): {len(events) / seconds:,.0f} events/s")
+
+    flagged, durations = time_detectors(events)
+    print()
+    print(f"{'detector':<34} {'calls':>10} {'mean us':>8} {'p50 us':>7} {'p99 us':>7} {'max us':>8}")
+    for reason, samples in durations.items():
+        samples.sort()
+        mean = sum(samples) / len(samples) if samples else 0.0
+        print(f"{reason:<34} {len(samples):>10,} {mean / 1e3:>8.2f} {_percentile(samples, 0.5) / 1e3:>7.2f} "
+              f"{_percentile(samples, 0.99) / 1e3:>7.2f} {(samples[-1] if samples else 0) / 1e3:>8.2f}")
+
+    if not labelled:
+        return
+    print()
+    print(f"{len(bots):,} labelled bots among {len(users):,} users")
+    print(f"{'detector':<34} {'flagged':>8} {'bots':>6} {'precision':>9} {'recall':>7}")
+    for reason, users_flagged in flagged.items():
+        print(f"{reason:<34} {score(users_flagged, bots)}")
+    print(f"{'analyser (any reason)':<34} {score(set(sink.detections), bots)}")
+    for label in sorted({event.get("label") for event in events} - {None, "normal"}):
+        group = {event["actor"] for event in events if event.get("label") == label}
+        caught = len(group & set(sink.detections))
+        print(f"  {label}: {caught:,}/{len(group):,} caught")
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the detectors on a recorded or synthetic event stream")
+    parser.add_argument("files", nargs="*", help="NDJSON event files (.gz allowed), in _id order")
+    parser.add_argument("--archive", action="store_true", help="Read the archived logs instead of files")
+    parser.add_argument("--start", type=datetime.date.fromisoformat)
+    parser.add_argument("--end", type=datetime.date.fromisoformat)
+    parser.add_argument("--labels", help="File with one bot username per line")
+    args = parser.parse_args()
+    if not args.files and not args.archive:
+        parser.error("give event files or --archive")
+    # The sink logs a warning per flag; a backtest flags thousands
+    logging.disable(logging.WARNING)
+
+    started = time.perf_counter()
+    events = list(read_archive("logs", args.start, args.end)) if args.archive else []
+    for path in args.files:
+        events.extend(read_events(path))
+    load_seconds = time.perf_counter() - started
+    if not events:
+        print("No events")
+        return
+
+    if args.labels:
+        with open(args.labels, encoding="utf-8") as f:
+            bots = {line.strip() for line in f if line.strip()}
+    else:
+        bots = {event["actor"] for event in events if event.get("label", "normal") != "normal"}
+    labelled = bool(args.labels) or any("label" in event for event in events)
+    report(events, bots, labelled, load_seconds)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Speedup of the sharded analysis against the number of worker processes, for the
+# incremental and the vectorized detectors on the same synthetic workload. Every run
+# must flag exactly the same users as the inline (0 workers) run.
+#
+#   python -m benchmarks.bench_analysis_pool [--normal 20000 --days 14 --workers 1 2 4 8]
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from benchmarks.workload import generate
+from services.analysis_pool import AnalysisPool, analyse_history_shard, analyse_shard
+
+async def run(pool: AnalysisPool, events: list):
+    # Warm up so process spawn and imports are not timed
+    await pool.map(analyse_shard, [([], {}) for _ in range(pool.shards)])
+
+    started = time.perf_counter()
+    shards = pool.split([event["actor"] for event in events])
+    results = await pool.map(analyse_shard, [([events[i] for i in indexes], {}) for indexes in shards])
+    incremental = time.perf_counter() - started
+    incremental_flags = {username: sorted(reasons) for flags, _ in results for username, reasons in flags.items()}
+
+    started = time.perf_counter()
+    shards = pool.split([event["actor"] for event in events])
+    results = await pool.map(analyse_history_shard, [
+        (
+            [events[i]["actor"] for i in indexes],
+            [events[i]["ts"] for i in indexes],
+            [(events[i]["actor"], events[i]["content"]) for i in indexes if "content" in events[i]],
+        )
+        for indexes in shards
+    ])
+    vectorized = time.perf_counter() - started
+    vectorized_flags = {username: sorted(reasons) for flags in results for username, reasons in flags.items()}
+    return incremental, incremental_flags, vectorized, vectorized_flags
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--normal", type=int, default=20_000)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--workers", type=int, nargs="*", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+    random.seed(7)
+    events = generate(args.normal, args.normal // 40, args.normal // 40, args.days)
+    print(f"{len(events):,} events, {os.cpu_count()} CPUs")
+
+    baseline = None
+    print(f"{'workers':>7} {'incr s':>8} {'speedup':>8} {'vec s':>8} {'speedup':>8} {'flagged':>8}")
+    for workers in [0, *args.workers]:
+        pool = AnalysisPool(workers)
+        pool.start()
+        try:
+            incremental, incremental_flags, vectorized, vectorized_flags = await run(pool, events)
+        finally:
+            await pool.stop()
+        if baseline is None:
+            baseline = (incremental, incremental_flags, vectorized, vectorized_flags)
+        assert incremental_flags == baseline[1] and vectorized_flags == baseline[3], f"{workers} workers disagree"
+        print(f"{workers:>7} {incremental:>8.2f} {baseline[0] / incremental:>7.2f}x "
+              f"{vectorized:>8.2f} {baseline[2] / vectorized:>7.2f}x {len(incremental_flags):>8,}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+# Throughput and latency of comment classification as the micro-batch size grows,
+# against a stub LLM backend: each completion takes BASE_SECONDS plus
+# PER_ITEM_SECONDS per comment in the prompt, at most LLM_CONCURRENCY run at once,
+# and MALFORMED_RATE of batched answers cannot be parsed (exercising the per-item
+# fallback). Comments arrive at ARRIVAL_RATE per second, like a bot wave.
+#
+#   python -m benchmarks.bench_comment_batcher
+import asyncio
+import json
+import random
+import re
+import time
+import types
+
+from routers import chatbot
+from services.llm import LLMGateway
+from services.micro_batcher import MicroBatcher
+
+COMMENTS = 1000
+ARRIVAL_RATE = 300
+BATCH_SIZES = [1, 2, 4, 8, 16, 32]
+MAX_WAIT = 0.025
+LLM_CONCURRENCY = 8
+BASE_SECONDS = 0.1
+PER_ITEM_SECONDS = 0.004
+MALFORMED_RATE = 0.02
+
+class StubCompletions:
+    async def create(self, messages, model):
+        prompt = messages[-1]["content"]
+        fenced = re.search(r"<items>\n(.*)\n</items>", prompt, re.DOTALL)
+        comments = [row["comment"] for row in json.loads(fenced.group(1))] if fenced else [prompt]
+        await asyncio.sleep(BASE_SECONDS + PER_ITEM_SECONDS * len(comments))
+        verdicts = ["yes" if "offer" in comment else "no" for comment in comments]
+        if len(comments) > 1 and random.random() < MALFORMED_RATE:
+            content = "Sure! Here are the verdicts: " + ", ".join(verdicts)
+        elif len(comments) > 1:
+            content = "\n".join(f"{number}: {verdict}" for number, verdict in enumerate(verdicts, 1))
+        else:
+            content = verdicts[0].capitalize()
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=content))])
+
+async def run(batch_size: int):
+    gateway = LLMGateway(api_key="stub", concurrency=LLM_CONCURRENCY, timeout=600)
+    gateway._client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=StubCompletions()))
+    chatbot.llm_gateway = gateway
+    batcher = MicroBatcher(chatbot.are_comments_suspicious, fallback=lambda item: chatbot.is_comment_suspicious(*item),
+                           max_items=batch_size, max_wait=MAX_WAIT)
+    latencies = []
+    wrong = 0
+
+    async def classify(i: int):
+        nonlocal wrong
+        comment = f"limited offer number {i}" if i % 5 == 0 else f"nice post {i}"
+        started = time.perf_counter()
+        verdict = await batcher.submit((comment, "Title", "Content"))
+        latencies.append(time.perf_counter() - started)
+        wrong += verdict != ("yes" if i % 5 == 0 else "no")
+
+    started = time.perf_counter()
+    tasks = []
+    for i in range(COMMENTS):
+        tasks.append(asyncio.create_task(classify(i)))
+        await asyncio.sleep(1 / ARRIVAL_RATE)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    stats = batcher.stats()
+    print(f"{batch_size:>5} {COMMENTS / elapsed:>10.0f} {latencies[len(latencies) // 2] * 1e3:>8.0f} "
+          f"{latencies[int(len(latencies) * 0.99)] * 1e3:>8.0f} {stats['avg_batch_size']:>9.1f} "
+          f"{gateway.requests:>9} {stats['fallbacks']:>9} {wrong:>6}")
+
+async def main():
+    random.seed(7)
+    print(f"{COMMENTS} comments at {ARRIVAL_RATE}/s, stub LLM {BASE_SECONDS * 1e3:.0f}ms + "
+          f"{PER_ITEM_SECONDS * 1e3:.0f}ms/comment, {LLM_CONCURRENCY} concurrent")
+    print(f"{'batch':>5} {'comments/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'avg batch':>9} {'LLM calls':>9} {'fallbacks':>9} {'wrong':>6}")
+    for batch_size in BATCH_SIZES:
+        await run(batch_size)
+
+if __name__ == "__main__":
+    asyncio.run(main())
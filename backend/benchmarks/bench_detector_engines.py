@@ -0,0 +1,55 @@
+# Pure-Python window detectors (the original per-run loops) vs. the NumPy engine on
+# the same synthetic log history. Both start from raw ISO timestamp strings, as
+# stored in the logs collection, and must flag exactly the same users.
+#
+#   python -m benchmarks.bench_detector_engines
+import datetime
+import random
+import time
+
+from services import detectors, detectors_numpy
+
+SIZES = [10_000, 100_000, 1_000_000]
+USERS_PER_EVENT = 0.01
+BOT_SHARE = 0.02
+
+def synthetic_logs(n: int):
+    users = max(1, int(n * USERS_PER_EVENT))
+    start = datetime.datetime(2025, 1, 1)
+    span = 30 * 86_400
+    logs = []
+    bots = {f"user{i}" for i in random.sample(range(users), max(1, int(users * BOT_SHARE)))}
+    for _ in range(n):
+        username = f"user{random.randrange(users)}"
+        offset = random.uniform(0, span)
+        if username in bots:
+            # Bots interact in tight bursts around a few anchor times
+            offset = (hash(username) % span) + random.uniform(0, 120)
+        logs.append((username, (start + datetime.timedelta(seconds=offset)).isoformat()))
+    return logs
+
+def run_python(logs):
+    events = [(username, datetime.datetime.fromisoformat(timestamp)) for username, timestamp in logs]
+    return detectors.find_high_frequency_users(events), detectors.find_time_pattern_users(events)
+
+def run_numpy(logs):
+    events = detectors_numpy.EventArrays()
+    events.extend([username for username, _ in logs], [timestamp for _, timestamp in logs])
+    return detectors_numpy.find_high_frequency_users(events), detectors_numpy.find_time_pattern_users(events)
+
+def main():
+    random.seed(7)
+    print(f"{'events':>10} {'python s':>10} {'numpy s':>10} {'speedup':>8} {'flagged':>8}")
+    for size in SIZES:
+        logs = synthetic_logs(size)
+        start = time.perf_counter()
+        expected = run_python(logs)
+        python_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        actual = run_numpy(logs)
+        numpy_seconds = time.perf_counter() - start
+        assert actual == expected, "engines disagree"
+        print(f"{size:>10,} {python_seconds:>10.2f} {numpy_seconds:>10.2f} {python_seconds / numpy_seconds:>7.1f}x {len(expected[0] | expected[1]):>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# Per-interaction cost of "is the post author a honeytrap?": a honeytraps find_one per
+# request (old) vs. a set lookup in the in-memory roster (new).
+#
+#   DATABASE_NAME=soney_bench python -m benchmarks.bench_honeytrap_roster
+import asyncio
+import random
+import statistics
+import time
+
+from benchmarks.scratch import require_scratch_db, drop_scratch_db
+from services.database import honeytraps_collection
+from services.honeytrap_roster import honeytrap_roster
+
+HONEYTRAPS = 1000
+REQUESTS = 5000
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+async def main():
+    require_scratch_db()
+    await honeytraps_collection.insert_many([{"username": f"trap{i}", "purpose": "bench"} for i in range(HONEYTRAPS)])
+    await honeytraps_collection.create_index("username")
+    await honeytrap_roster.load()
+    authors = [f"trap{random.randrange(HONEYTRAPS * 2)}" for _ in range(REQUESTS)]
+
+    before = []
+    for author in authors:
+        start = time.perf_counter()
+        await honeytraps_collection.find_one({"username": author})
+        before.append((time.perf_counter() - start) * 1e6)
+
+    after = []
+    for author in authors:
+        start = time.perf_counter()
+        author in honeytrap_roster
+        after.append((time.perf_counter() - start) * 1e6)
+
+    print(f"{REQUESTS} lookups over {HONEYTRAPS} honeytraps")
+    print("find_one:  p50 %8.1f us  p99 %8.1f us" % percentiles(before))
+    print("roster:    p50 %8.3f us  p99 %8.3f us" % percentiles(after))
+    await drop_scratch_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+# Post listing latency vs. page size: one find per post (old) vs. one aggregation
+# whose per-post $lookup is capped with $limit (new).
+#
+# Run from backend/ against a scratch database:
+#   DATABASE_NAME=soney_bench python -m benchmarks.bench_post_listing
+import asyncio
+import datetime
+import statistics
+import time
+
+from benchmarks.scratch import require_scratch_db, drop_scratch_db
+from services.database import posts_collection, comments_collection, ensure_indexes
+from services.posts import DEFAULT_COMMENTS_LIMIT, build_post_response, build_post_responses
+from models.comment import Comment
+
+PAGE_SIZES = [10, 25, 50, 100, 200]
+COMMENTS_PER_POST = 5
+REPEATS = 20
+
+async def seed(n_posts: int):
+    await posts_collection.delete_many({})
+    await comments_collection.delete_many({})
+    now = datetime.datetime.now().isoformat()
+    posts = [{
+        "title": f"Post {i}",
+        "author_id": f"user{i % 20}",
+        "content": "benchmark content",
+        "hashtags": [],
+        "created_at": now,
+        "updated_at": now,
+        "likes_count": 0,
+        "dislikes_count": 0,
+        "comments_count": COMMENTS_PER_POST,
+        "comments": []
+    } for i in range(n_posts)]
+    result = await posts_collection.insert_many(posts)
+    comments = [{
+        "post_id": str(post_id),
+        "author_id": f"user{j}",
+        "content": f"comment {j}",
+        "created_at": now
+    } for post_id in result.inserted_ids for j in range(COMMENTS_PER_POST)]
+    await comments_collection.insert_many(comments)
+    await ensure_indexes()
+
+async def n_plus_one(limit: int):
+    # The listing as it used to be: one comments query per post.
+    posts = await posts_collection.find().to_list(limit)
+    responses = []
+    for post in posts:
+        comments = await comments_collection.find({"post_id": str(post["_id"])}).to_list(DEFAULT_COMMENTS_LIMIT)
+        responses.append(build_post_response(post, [Comment(**{**comment, "_id": str(comment["_id"])}) for comment in comments]))
+    return responses
+
+async def batched(limit: int):
+    posts = await posts_collection.find().to_list(limit)
+    return await build_post_responses(posts)
+
+async def timed(fn, limit: int) -> list:
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        await fn(limit)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+async def main():
+    require_scratch_db()
+    await seed(max(PAGE_SIZES))
+    print(f"{'posts':>6} {'n+1 p50 ms':>12} {'batched p50 ms':>15} {'speedup':>8}")
+    for size in PAGE_SIZES:
+        old = statistics.median(await timed(n_plus_one, size))
+        new = statistics.median(await timed(batched, size))
+        print(f"{size:>6} {old:>12.2f} {new:>15.2f} {old / new:>7.1f}x")
+    await drop_scratch_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+# Throughput of the streaming rate detector on one core, and how long a flag takes
+# to reach Mongo: from the event that crossed the threshold to the flush that wrote it.
+#
+#   DATABASE_NAME=soney_bench python -m benchmarks.bench_rate_detector
+import asyncio
+import random
+import time
+
+from benchmarks.scratch import require_scratch_db, drop_scratch_db
+from services.rate_detector import RateDetector
+
+EVENTS = 1_000_000
+USERS = 20_000
+BOTS = 200
+# The persistence run replays the start of the stream in real time
+LIVE_EVENTS = 50_000
+LIVE_SECONDS = 5.0
+LIVE_CHUNK = 500
+
+def measure_throughput(stream):
+    detector = RateDetector(max_users=50_000)
+    # Simulated clock: EVENTS spread over an hour, so ordinary users stay well under
+    # the threshold while bots fire a burst every few milliseconds
+    step = 3600 / EVENTS
+    start = time.perf_counter()
+    for i, username in enumerate(stream):
+        detector.observe(username, i * step)
+    elapsed = time.perf_counter() - start
+    print(f"{EVENTS:,} events, {USERS:,} users, {BOTS} bots")
+    print(f"throughput: {EVENTS / elapsed:,.0f} events/s ({elapsed * 1e9 / EVENTS:.0f} ns/event)")
+    print(f"flagged: {detector.flags} users, tracked rings: {len(detector._rings):,}, evictions: {detector.evictions:,}")
+
+async def measure_flag_delay(stream):
+    require_scratch_db()
+    detector = RateDetector(max_users=50_000)
+    detector.start()
+    try:
+        pause = LIVE_SECONDS * LIVE_CHUNK / LIVE_EVENTS
+        for i in range(0, LIVE_EVENTS, LIVE_CHUNK):
+            for username in stream[i:i + LIVE_CHUNK]:
+                detector.observe(username)
+            await asyncio.sleep(pause)
+        await detector.stop()
+    finally:
+        await drop_scratch_db()
+    stats = detector.stats()
+    print(f"live: {LIVE_EVENTS:,} events over {LIVE_SECONDS:.0f}s, flagged {stats['flags']} users")
+    print(f"flag delay, event to persisted: max {stats['max_flag_delay_ms']:.1f} ms (flush interval {detector.flush_interval * 1000:.0f} ms)")
+
+def main():
+    stream = [f"bot{random.randrange(BOTS)}" if random.random() < 0.05 else f"user{random.randrange(USERS)}" for _ in range(EVENTS)]
+    measure_throughput(stream)
+    asyncio.run(measure_flag_delay(stream))
+
+if __name__ == "__main__":
+    main()
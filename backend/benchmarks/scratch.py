@@ -0,0 +1,14 @@
+# Shared setup for benchmarks that need Mongo: point services.database at a scratch
+# database before anything imports it, and refuse to touch the application database.
+import os
+
+os.environ.setdefault("DATABASE_NAME", "soney_bench")
+
+from services.database import db
+
+def require_scratch_db():
+    if db.name == "soney":
+        raise SystemExit("Refusing to benchmark against the application database; set DATABASE_NAME to a scratch database.")
+
+async def drop_scratch_db():
+    await db.client.drop_database(db.name)
@@ -0,0 +1,83 @@
+# Concurrency stress check for likes. First every user sends the same like several
+# times at once (the double-submit race the old check-then-insert path lost), then
+# many users like and unlike another post at once, several times each. Both must
+# leave likes_count equal to the number of like documents and to the number of
+# distinct users who ended up liking.
+#
+#   DATABASE_NAME=soney_bench python -m benchmarks.stress_likes
+import asyncio
+import random
+import time
+
+from bson import ObjectId
+from benchmarks.scratch import require_scratch_db, drop_scratch_db
+from fastapi import HTTPException
+from services.counters import post_counters
+from services.database import ensure_indexes, likes_collection, posts_collection
+from services.likes import add_like, remove_like
+
+USERS = 200
+ATTEMPTS_PER_USER = 10
+DUPLICATES_PER_USER = 5
+
+async def duplicate_likes(post_id: str, username: str):
+    # All copies race past the same state; exactly one may win
+    results = await asyncio.gather(*(add_like(post_id, username) for _ in range(DUPLICATES_PER_USER)), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception) and not (isinstance(result, HTTPException) and result.status_code == 400):
+            raise result
+    assert sum(not isinstance(result, Exception) for result in results) == 1, f"{username} liked more than once"
+
+async def churn(post_id: str, username: str):
+    for _ in range(ATTEMPTS_PER_USER):
+        try:
+            if random.random() < 0.7:
+                await add_like(post_id, username)
+            else:
+                await remove_like({"post_id": post_id, "user_id": username}, username)
+        except HTTPException as e:
+            if e.status_code not in (400, 404):
+                raise
+
+async def create_post() -> str:
+    result = await posts_collection.insert_one({
+        "title": "Hot post",
+        "author_id": "author",
+        "content": "stress",
+        "hashtags": [],
+        "likes_count": 0,
+        "dislikes_count": 0,
+        "comments_count": 0,
+        "comments": [],
+        "honeytrap": False
+    })
+    return str(result.inserted_id)
+
+async def check_counts(name: str, post_id: str, operations: int, elapsed: float):
+    await post_counters.flush()
+    post = await posts_collection.find_one({"_id": ObjectId(post_id)})
+    like_docs = await likes_collection.count_documents({"post_id": post_id})
+    distinct_users = len(await likes_collection.distinct("user_id", {"post_id": post_id}))
+    print(f"{name}: {operations} operations in {elapsed:.2f}s")
+    print(f"  likes_count={post['likes_count']} like documents={like_docs} distinct users={distinct_users}")
+    assert post["likes_count"] == like_docs == distinct_users, f"{name}: like counter drifted"
+
+async def main():
+    require_scratch_db()
+    await ensure_indexes()
+    try:
+        post_id = await create_post()
+        start = time.perf_counter()
+        await asyncio.gather(*(duplicate_likes(post_id, f"user{i}") for i in range(USERS)))
+        await check_counts("duplicate likes", post_id, USERS * DUPLICATES_PER_USER, time.perf_counter() - start)
+
+        post_id = await create_post()
+        start = time.perf_counter()
+        await asyncio.gather(*(churn(post_id, f"user{i}") for i in range(USERS)))
+        await check_counts("like/unlike churn", post_id, USERS * ATTEMPTS_PER_USER, time.perf_counter() - start)
+    finally:
+        await drop_scratch_db()
+    print("OK: counts are exact")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+# Synthetic interaction streams with labelled bots, for the backtest harness. Events
+# are shaped like logs documents (plus a "label" field) and written as gzip NDJSON,
+# the same format as the log archive.
+#
+#   python -m benchmarks.workload --out workload.ndjson.gz [--normal 2000 --bursty 50 --drip 50 --days 14]
+#
+# Three kinds of accounts:
+#   normal  sessions of a few interactions at random times of day, mostly clean comments
+#   bursty  ordinary-looking days plus bursts of dozens of interactions seconds apart
+#   drip    one or two interactions a day, scripted at the same time of day
+import argparse
+import calendar
+import datetime
+import gzip
+import random
+import struct
+from bson import ObjectId, json_util
+from models.event import EventType
+
+JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS
+START = datetime.datetime(2025, 1, 1)
+HONEYTRAPS = [f"honeytrap{i}" for i in range(20)]
+TYPES = [EventType.POST_LIKED, EventType.COMMENTED, EventType.FRIEND_REQUEST_SENT, EventType.POST_DISLIKED]
+TYPE_WEIGHTS = [6, 3, 1, 1]
+CLEAN_COMMENTS = [
+    "Great post!", "Love this", "Where was this taken?", "So true", "Haha nice one",
+    "Congrats!", "Looks amazing", "I agree with this", "Thanks for sharing", "Beautiful view",
+]
+SPAM_COMMENTS = [
+    "Click here for a FREE gift", "Buy now!!! limited offer", "Earn $500/day, visit www.cash-fast.biz",
+    "Free followers at http://bit.ly/xyz", "### HOT DEALS ###",
+]
+
+def _event(actor: str, label: str, ts: datetime.datetime, spam_rate: float) -> dict:
+    event_type = random.choices(TYPES, TYPE_WEIGHTS)[0]
+    event = {
+        "type": event_type.value,
+        "actor": actor,
+        "action": f"{actor} {event_type.value.replace('_', ' ')}",
+        "target": random.choice(HONEYTRAPS),
+        "ts": ts,
+        "label": label,
+    }
+    if event_type == EventType.COMMENTED:
+        event["content"] = random.choice(SPAM_COMMENTS if random.random() < spam_rate else CLEAN_COMMENTS)
+    return event
+
+def _day(day: int, seconds: float) -> datetime.datetime:
+    return START + datetime.timedelta(days=day, seconds=seconds)
+
+def normal_user(actor: str, days: int):
+    for day in range(days):
+        for _ in range(random.randint(0, 3)):
+            at = random.uniform(7 * 3600, 24 * 3600)
+            for _ in range(random.randint(1, 6)):
+                yield _event(actor, "normal", _day(day, at), spam_rate=0.002)
+                at += random.uniform(5, 300)
+
+def bursty_bot(actor: str, days: int):
+    yield from (dict(event, label="bursty") for event in normal_user(actor, days))
+    for _ in range(random.randint(1, 3)):
+        at = random.uniform(0, days * 86_400 - 3600)
+        for _ in range(random.randint(12, 40)):
+            yield _event(actor, "bursty", _day(0, at), spam_rate=0.3)
+            at += random.uniform(0.5, 4)
+
+def drip_account(actor: str, days: int):
+    anchor = random.uniform(0, 86_400 - 60)
+    for day in range(days):
+        if random.random() < 0.85:
+            yield _event(actor, "drip", _day(day, anchor + random.uniform(0, 40)), spam_rate=0.1)
+        if random.random() < 0.3:
+            yield _event(actor, "drip", _day(day, random.uniform(0, 86_400)), spam_rate=0.1)
+
+def generate(normal: int, bursty: int, drip: int, days: int) -> list:
+    """
+    Builds a labelled event stream.
+
+    Args:
+        normal (int): Number of ordinary users.
+        bursty (int): Number of bots interacting in bursts.
+        drip (int): Number of scripted accounts interacting at a fixed time of day.
+        days (int): Length of the stream, starting at START.
+
+    Returns:
+        list: Events in ts order, with _ids increasing in the same order.
+    """
+    events = []
+    for prefix, count, make in (("user", normal, normal_user), ("burst", bursty, bursty_bot), ("drip", drip, drip_account)):
+        for i in range(count):
+            events.extend(make(f"{prefix}{i}", days))
+    events.sort(key=lambda event: event["ts"])
+    for i, event in enumerate(events):
+        # ObjectId layout: 4-byte seconds, then a counter that keeps _id order = ts order
+        event["_id"] = ObjectId(struct.pack(">IQ", calendar.timegm(event["ts"].timetuple()), i))
+    return events
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a labelled synthetic interaction stream")
+    parser.add_argument("--out", required=True, help="Output file (.ndjson or .ndjson.gz)")
+    parser.add_argument("--normal", type=int, default=2000)
+    parser.add_argument("--bursty", type=int, default=50)
+    parser.add_argument("--drip", type=int, default=50)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    events = generate(args.normal, args.bursty, args.drip, args.days)
+    opener = gzip.open if args.out.endswith(".gz") else open
+    with opener(args.out, "wt", encoding="utf-8") as f:
+        for event in events:
+            f.write(json_util.dumps(event, json_options=JSON_OPTIONS))
+            f.write("\n")
+    print(f"Wrote {len(events):,} events of {args.normal + args.bursty + args.drip:,} users to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,18 @@ from routers import auth, post, comment, likes, chat,user,friends,honeytrap
 from starlette.middleware.cors import CORSMiddleware
 import logging,asyncio
 from routers.chat import ws
+from routers.chatbot import comment_batcher
+from services.analysis_pool import analysis_pool
+from services.comment_model import comment_model
+from services.content_pool import content_pool
+from services.counters import post_counters
+from services.database import ensure_indexes
+from services.honeytrap_roster import honeytrap_roster
+from services.honeytrap_stats import honeytrap_stats
+from services.llm import llm_gateway
+from services.log_writer import log_writer
+from services.rate_detector import rate_detector
+from services.rollups import activity_rollups
 
 app = FastAPI()
 
@@ -25,6 +37,32 @@ app.include_router(user.router, prefix="/user", tags=["User"])
 app.include_router(friends.router, prefix="/friends", tags=["Friends"])
 app.include_router(honeytrap.router, prefix="/honeytrap", tags=["Honeytrap"])
 
+@app.on_event("startup")
+async def startup():
+    await ensure_indexes()
+    post_counters.start()
+    await honeytrap_roster.start()
+    log_writer.start()
+    rate_detector.start()
+    honeytrap_stats.start()
+    activity_rollups.start()
+    analysis_pool.start()
+    comment_model.load()
+    content_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await honeytrap_roster.stop()
+    await log_writer.stop()
+    await rate_detector.stop()
+    await honeytrap_stats.stop()
+    await activity_rollups.stop()
+    await analysis_pool.stop()
+    await content_pool.stop()
+    await comment_batcher.stop()
+    await llm_gateway.stop()
+    await post_counters.stop()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the API"}
@@ -0,0 +1,109 @@
+# One-off migration of free-text interaction logs ({username, action, timestamp}) to
+# typed events ({type, actor, target, post_id, content, ts, action}).
+#
+# Safe to re-run: only logs without a `type` are touched. Run from backend/:
+#   python -m migrations.typed_log_events
+import asyncio
+import datetime
+import logging
+import re
+from typing import Optional
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+from models.event import EventType
+from services.database import logs_collection, posts_collection, ensure_indexes
+
+logging.basicConfig(level=logging.INFO)
+
+BATCH_SIZE = 1000
+
+# Every sentence log_action has written, most specific first. Actions that name a post
+# only carry its title; the post (and so the honeytrap it belongs to) is looked up.
+PATTERNS = [
+    (EventType.POST_CREATED, r"Created post: (?P<title>.*)"),
+    (EventType.FRIEND_REQUEST_SENT, r"Sent friend request to honeytrap user: (?P<target>.*)"),
+    (EventType.FRIEND_REQUEST_SENT, r"Sent friend request to (?P<target>.*)"),
+    (EventType.FRIEND_REQUEST_ACCEPTED, r"Accepted friend request from (?P<target>.*)"),
+    (EventType.POST_LIKED, r"Liked (?:honeytrap post: |post )(?P<title>.*)"),
+    (EventType.POST_UNLIKED, r"Removed like from honeytrap post: (?P<title>.*)"),
+    (EventType.POST_DISLIKED, r"Disliked (?:honeytrap post: |post )(?P<title>.*)"),
+    (EventType.COMMENTED, r"Commented (?P<content>.*) on honeytrap post: (?P<title>.*)"),
+    (EventType.COMMENTED, r"Commented on post (?P<title>.*?): .*"),
+    (EventType.SUSPICIOUS_COMMENT, r"Suspicious comment on honeytrap post: (?P<title>.*)"),
+    (EventType.SUSPICIOUS_COMMENT, r"Spam rules matched on honeytrap post: (?P<title>.*): (?:keyword|domain|url|regex|repeated_chars).*"),
+]
+PATTERNS = [(event_type, re.compile(pattern, re.DOTALL)) for event_type, pattern in PATTERNS]
+
+def parse_action(action: str) -> dict:
+    """
+    Recovers the typed fields of a free-text log action.
+
+    Args:
+        action (str): The logged sentence.
+
+    Returns:
+        dict: "type" plus whichever of "target", "title" and "content" it names.
+    """
+    for event_type, pattern in PATTERNS:
+        match = pattern.fullmatch(action)
+        if match:
+            return {"type": event_type.value, **{k: v for k, v in match.groupdict().items() if v is not None}}
+    return {"type": EventType.OTHER.value}
+
+def parse_timestamp(timestamp) -> datetime.datetime:
+    # Old logs hold naive local-time ISO strings; events hold naive UTC datetimes
+    if isinstance(timestamp, str):
+        timestamp = datetime.datetime.fromisoformat(timestamp)
+    return timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+async def find_post(title: str, posts_by_title: dict) -> Optional[dict]:
+    if title not in posts_by_title:
+        posts_by_title[title] = await posts_collection.find_one({"title": title}, {"author_id": 1}, sort=[("_id", -1)])
+    return posts_by_title[title]
+
+async def migrate_batch(logs: list, posts_by_title: dict) -> int:
+    operations = []
+    for log in logs:
+        fields = parse_action(log.get("action", ""))
+        event = {"type": fields["type"], "actor": log["username"], "ts": parse_timestamp(log["timestamp"])}
+        if "target" in fields:
+            event["target"] = fields["target"]
+        if "content" in fields:
+            event["content"] = fields["content"]
+        if "title" in fields:
+            post = await find_post(fields["title"], posts_by_title)
+            if post:
+                event["post_id"] = str(post["_id"])
+                if post["author_id"] != log["username"]:
+                    event["target"] = post["author_id"]
+        operations.append(UpdateOne(
+            {"_id": log["_id"]},
+            {"$set": event, "$unset": {"username": "", "timestamp": ""}}
+        ))
+    await logs_collection.bulk_write(operations, ordered=False)
+    return len(operations)
+
+async def main():
+    posts_by_title = {}
+    migrated = 0
+    last_id = None
+    while True:
+        query = {"type": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        logs = await logs_collection.find(query).sort("_id", 1).limit(BATCH_SIZE).to_list(BATCH_SIZE)
+        if not logs:
+            break
+        migrated += await migrate_batch(logs, posts_by_title)
+        last_id = logs[-1]["_id"]
+        logging.info(f"Migrated {migrated} logs")
+
+    try:
+        await logs_collection.drop_index("username_1__id_1")
+    except OperationFailure:
+        pass
+    await ensure_indexes()
+    logging.info(f"Done: {migrated} logs migrated to typed events")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+import datetime
+from enum import Enum
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
+
+class EventType(str, Enum):
+    POST_CREATED = "post_created"
+    FRIEND_REQUEST_SENT = "friend_request_sent"
+    FRIEND_REQUEST_ACCEPTED = "friend_request_accepted"
+    POST_LIKED = "post_liked"
+    POST_UNLIKED = "post_unliked"
+    POST_DISLIKED = "post_disliked"
+    COMMENTED = "commented"
+    SUSPICIOUS_COMMENT = "suspicious_comment"
+    OTHER = "other"
+
+class InteractionEvent(BaseModel):
+    """
+    One logged interaction. `actor` did `type` to `target` (the other account
+    involved, usually a honeytrap); `action` keeps the human-readable sentence for
+    display. `content` is the comment text of user comments on honeytrap posts.
+    """
+    model_config = ConfigDict(use_enum_values=True)
+
+    type: EventType
+    actor: str
+    action: str
+    ts: datetime.datetime
+    target: Optional[str] = None
+    post_id: Optional[str] = None
+    comment_id: Optional[str] = None
+    content: Optional[str] = None
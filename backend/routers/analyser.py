@@ -1,109 +1,158 @@
 # analyser.py
+import asyncio
+import copy
 import datetime
 import logging
-from services.database import logs_collection, detected_collection
+import os
+from typing import Iterable, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from services.analysis_pool import analysis_pool, analyse_history_shard, analyse_shard
+from services.database import logs_collection, analyser_state_collection, analyser_users_collection
+from services.detections import DetectionSink
+from services.detectors import analyse_events
 
 logging.basicConfig(level=logging.INFO)
 
-# High-Frequency Interactors
-async def detect_high_frequency_interactors():
-    logs = await logs_collection.find().to_list(length=1000)
-    interaction_counts = {}
-    suspicious_users = set()
-    for log in logs:
-        username = log["username"]
-        timestamp = datetime.datetime.fromisoformat(log["timestamp"])
-        if username not in interaction_counts:
-            interaction_counts[username] = []
-        interaction_counts[username].append(timestamp)
-    
-    for username, timestamps in interaction_counts.items():
-        timestamps.sort()
-        for i in range(len(timestamps) - 10):
-            if (timestamps[i + 10] - timestamps[i]).total_seconds() < 60:  # 10 interactions in 1 minute
-                suspicious_users.add(username)
-                break
-    
-    for user in suspicious_users:
-        logging.warning(f"High-frequency interaction detected for user: {user}")
-        existing_record = await detected_collection.find_one({"username": user})
-        if existing_record:
-            if "High-frequency interaction" not in existing_record["reasons"]:
-                await detected_collection.update_one(
-                    {"username": user},
-                    {"$push": {"reasons": "High-frequency interaction"}}
-                )
-        else:
-            await detected_collection.insert_one({
-                "username": user,
-                "reasons": ["High-frequency interaction"],
-                "timestamp": datetime.datetime.now().isoformat()
-            })
+# Each run only reads logs newer than the persisted high-water mark, in _id order,
+# streamed in batches of BATCH_SIZE. Logs younger than WATERMARK_LAG are left for the
+# next run so a slow writer inserting an older _id cannot slip behind the mark.
+BATCH_SIZE = 1000
+# With the process pool, batches are sized per shard so each worker task is big
+# enough to be worth the round trip
+SHARD_BATCH_SIZE = 5000
+WATERMARK_LAG = datetime.timedelta(seconds=10)
+WATERMARK_ID = "logs"
+# "incremental" analyses only new logs; "vectorized" re-runs the window detectors
+# over the whole log history with NumPy (e.g. after changing a threshold).
+ANALYSER_ENGINE = os.getenv("ANALYSER_ENGINE", "incremental")
+HISTORY_BATCH_SIZE = 50_000
 
-# Content Analysis
-async def detect_spammy_content():
-    logs = await logs_collection.find({"action": {"$regex": "commented"}}).to_list(length=1000)
-    spammy_patterns = ["http", "www", "click here", "buy now", "free", "!!!", "###"]
-    suspicious_users = set()
-    for log in logs:
-        username = log["username"]
-        action = log["action"]
-        if any(pattern in action.lower() for pattern in spammy_patterns):
-            suspicious_users.add(username)
-    
-    for user in suspicious_users:
-        logging.warning(f"Spammy content detected for user: {user}")
-        existing_record = await detected_collection.find_one({"username": user})
-        if existing_record:
-            if "Spammy content" not in existing_record["reasons"]:
-                await detected_collection.update_one(
-                    {"username": user},
-                    {"$push": {"reasons": "Spammy content"}}
-                )
-        else:
-            await detected_collection.insert_one({
-                "username": user,
-                "reasons": ["Spammy content"],
-                "timestamp": datetime.datetime.now().isoformat()
-            })
+_run_lock = asyncio.Lock()
 
-# Time-Based Patterns
-async def detect_time_based_patterns():
-    logs = await logs_collection.find().to_list(length=1000)
-    interaction_times = {}
-    suspicious_users = set()
-    for log in logs:
-        username = log["username"]
-        timestamp = datetime.datetime.fromisoformat(log["timestamp"]).time()
-        if username not in interaction_times:
-            interaction_times[username] = []
-        interaction_times[username].append(timestamp)
-    
-    for username, times in interaction_times.items():
-        times.sort()
-        for i in range(len(times) - 10):
-            if (datetime.datetime.combine(datetime.date.today(), times[i + 10]) - datetime.datetime.combine(datetime.date.today(), times[i])).total_seconds() < 60:  # 10 interactions in 1 minute
-                suspicious_users.add(username)
-                break
-    
-    for user in suspicious_users:
-        logging.warning(f"Time-based interaction pattern detected for user: {user}")
-        existing_record = await detected_collection.find_one({"username": user})
-        if existing_record:
-            if "Time-based interaction pattern" not in existing_record["reasons"]:
-                await detected_collection.update_one(
-                    {"username": user},
-                    {"$push": {"reasons": "Time-based interaction pattern"}}
-                )
+def _state_update(username: str, before: Optional[dict], after: dict) -> Optional[UpdateOne]:
+    # Writes only what the batch changed. The per-second time-of-day counts are
+    # updated entry by entry rather than rewritten with the rest of the state.
+    before = before or {}
+    changed, removed = {}, {}
+    for field, value in after.items():
+        old = before.get(field)
+        if field == "_id" or old == value:
+            continue
+        if field == "seconds" and isinstance(old, dict):
+            changed.update({f"seconds.{second}": count for second, count in value.items() if old.get(second) != count})
+            removed.update({f"seconds.{second}": "" for second in old.keys() - value.keys()})
         else:
-            await detected_collection.insert_one({
-                "username": user,
-                "reasons": ["Time-based interaction pattern"],
-                "timestamp": datetime.datetime.now().isoformat()
-            })
+            changed[field] = value
+    removed.update({field: "" for field in before.keys() - after.keys()})
+    update = {}
+    if changed:
+        update["$set"] = changed
+    if removed:
+        update["$unset"] = removed
+    return UpdateOne({"_id": username}, update, upsert=True) if update else None
+
+async def _process_batch(logs: list):
+    usernames = list({log["actor"] for log in logs})
+    states = {
+        state["_id"]: state
+        async for state in analyser_users_collection.find({"_id": {"$in": usernames}})
+    }
+    stored = copy.deepcopy(states)
+
+    shards = []
+    for indexes in analysis_pool.split([log["actor"] for log in logs]):
+        shard_logs = [logs[i] for i in indexes]
+        shard_users = {log["actor"] for log in shard_logs}
+        shards.append((shard_logs, {username: state for username, state in states.items() if username in shard_users}))
+    sink = DetectionSink()
+    for flags, shard_states in await analysis_pool.map(analyse_shard, shards):
+        states.update(shard_states)
+        for username, reasons in flags.items():
+            for reason in reasons:
+                sink.flag(username, reason)
+    await sink.commit()
+    updates = [_state_update(username, stored.get(username), states[username]) for username in usernames]
+    updates = [update for update in updates if update is not None]
+    if updates:
+        await analyser_users_collection.bulk_write(updates, ordered=False)
+    await analyser_state_collection.update_one(
+        {"_id": WATERMARK_ID},
+        {"$set": {"last_id": logs[-1]["_id"], "updated_at": datetime.datetime.utcnow()}},
+        upsert=True
+    )
+
+async def analyze_full_history():
+    shards = [([], [], []) for _ in range(analysis_pool.shards)]
+    cursor = logs_collection.find({}, {"actor": 1, "ts": 1, "content": 1, "_id": 0}).batch_size(HISTORY_BATCH_SIZE)
+    batch = []
+    async for log in cursor:
+        batch.append(log)
+        if len(batch) >= HISTORY_BATCH_SIZE:
+            _add_to_shards(shards, batch)
+            batch = []
+    _add_to_shards(shards, batch)
+
+    sink = DetectionSink()
+    for flags in await analysis_pool.map(analyse_history_shard, shards):
+        for username, reasons in flags.items():
+            for reason in reasons:
+                sink.flag(username, reason)
+    await sink.commit()
+    logging.info(f"Analysed full history of {sum(len(set(usernames)) for usernames, _, _ in shards)} users")
+
+def _add_to_shards(shards: list, logs: list):
+    for shard, indexes in zip(shards, analysis_pool.split([log["actor"] for log in logs])):
+        usernames, timestamps, comments = shard
+        for i in indexes:
+            log = logs[i]
+            usernames.append(log["actor"])
+            timestamps.append(log["ts"])
+            if log.get("content") is not None:
+                comments.append((log["actor"], log["content"]))
+
+async def replay_events(logs: Iterable[dict], sink: DetectionSink) -> dict:
+    """
+    Runs the incremental detectors over a stream of past events (e.g. read back from
+    the archive) with fresh per-user state, leaving the live analyser state and
+    watermark untouched.
+
+    Args:
+        logs (iterable): Events in _id order.
+        sink (DetectionSink): Receives the flags; committed at the end.
+
+    Returns:
+        dict: The final per-user detector state.
+    """
+    states = {}
+    analyse_events(logs, states, sink)
+    await sink.commit()
+    return states
 
 # Schedule Analysis
 async def analyze_interactions():
-    await detect_high_frequency_interactors()
-    await detect_spammy_content()
-    await detect_time_based_patterns()
\ No newline at end of file
+    if ANALYSER_ENGINE == "vectorized":
+        async with _run_lock:
+            await analyze_full_history()
+        return
+    async with _run_lock:
+        watermark = await analyser_state_collection.find_one({"_id": WATERMARK_ID})
+        upper = ObjectId.from_datetime(datetime.datetime.now(datetime.timezone.utc) - WATERMARK_LAG)
+        query = {"_id": {"$lt": upper}}
+        if watermark:
+            query["_id"]["$gt"] = watermark["last_id"]
+
+        batch_size = BATCH_SIZE if analysis_pool.shards == 1 else SHARD_BATCH_SIZE * analysis_pool.shards
+        processed = 0
+        batch = []
+        cursor = logs_collection.find(query, {"actor": 1, "ts": 1, "content": 1}).sort("_id", 1).batch_size(batch_size)
+        async for log in cursor:
+            batch.append(log)
+            if len(batch) >= batch_size:
+                await _process_batch(batch)
+                processed += len(batch)
+                batch = []
+        if batch:
+            await _process_batch(batch)
+            processed += len(batch)
+        logging.info(f"Analysed {processed} new interaction logs")
@@ -3,10 +3,19 @@ import datetime
 import logging
 import asyncio
 from services.database import honeytraps_collection, users_collection, posts_collection, comments_collection
+from services.cache import POSTS_LIST_TAG, post_cache, post_tag
+from services.content_pool import content_pool
+from services.counters import post_counters
+from services.feed import fan_out_post
+from services.honeytrap_roster import honeytrap_roster
+from services.honeytrap_stats import honeytrap_stats
+from services.trending import trending_hashtags
+from models.event import EventType
 from .log import log_action
 import string
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from routers.analyser import analyze_interactions
+from services.retention import run_retention
 from routers.chatbot import generate_enticing_post_content,generate_comment_content
 
 scheduler = AsyncIOScheduler()
@@ -15,7 +24,9 @@ scheduler.start()
 async def create_enticing_post(username: str):
     honeytrap = await honeytraps_collection.find_one({"username": username})
     purpose = honeytrap["purpose"]
-    title, content = await generate_enticing_post_content(purpose)
+    title, content = await content_pool.take_post(purpose) or await generate_enticing_post_content(purpose)
+    # Ride whatever is trending; honeytrap posts are not counted back into the trend
+    hashtags = [trend["tag"] for trend in await trending_hashtags("day", 3)]
     post_data = {
         "title": title,
         "content": content,
@@ -26,18 +37,22 @@ async def create_enticing_post(username: str):
         "dislikes_count": 0,
         "comments_count": 0,
         "comments": [],
-        "hashtags": [],
+        "hashtags": hashtags,
         "pictures": [],
-        "videos": []
+        "videos": [],
+        "honeytrap": True
     }
-    await posts_collection.insert_one(post_data)
-    await log_action(username, f"Created post: {title}")
+    result = await posts_collection.insert_one(post_data)
+    await fan_out_post(result.inserted_id, username, honeytrap.get("friends", []))
+    post_cache.invalidate(POSTS_LIST_TAG)
+    honeytrap_stats.post_created(result.inserted_id, title)
+    await log_action(username, EventType.POST_CREATED, f"Created post: {title}", post_id=result.inserted_id)
 
 async def get_random_honeytrap(exclude_username: str) -> str:
-    honeytraps = await honeytraps_collection.find({"username": {"$ne": exclude_username}}).to_list(length=100)
+    honeytraps = [username for username in honeytrap_roster.usernames if username != exclude_username]
     if not honeytraps:
         return None
-    return random.choice(honeytraps)["username"]
+    return random.choice(honeytraps)
 
 async def send_friend_request(sender_username: str):
     receiver_username = await get_random_honeytrap(sender_username)
@@ -52,7 +67,7 @@ async def send_friend_request(sender_username: str):
                 {"username": receiver_username},
                 {"$push": {"friend_requests": sender_username}}
             )
-            await log_action(sender_username, f"Sent friend request to {receiver_username}")
+            await log_action(sender_username, EventType.FRIEND_REQUEST_SENT, f"Sent friend request to {receiver_username}", target=receiver_username)
 
             # Accept the friend request after a delay
             await asyncio.sleep(20)  # Delay of 20 seconds before accepting the friend request
@@ -79,7 +94,7 @@ async def accept_friend_request(username: str, friend_username: str):
             {"username": friend_username},
             {"$addToSet": {"friends": username}}
         )
-        await log_action(username, f"Accepted friend request from {friend_username}")
+        await log_action(username, EventType.FRIEND_REQUEST_ACCEPTED, f"Accepted friend request from {friend_username}", target=friend_username)
 
 async def interact_with_posts(username: str):
     posts = await posts_collection.find({"author_id": {"$ne": username}}).to_list(length=100)
@@ -87,19 +102,15 @@ async def interact_with_posts(username: str):
         post = random.choice(posts)
         action = random.choice(["like", "dislike", "comment"])
         if action == "like":
-            await posts_collection.update_one(
-                {"_id": post["_id"]},
-                {"$inc": {"likes_count": 1}}
-            )
-            await log_action(username, f"Liked post {post['title']}")
+            post_counters.incr(post["_id"], "likes_count")
+            post_cache.invalidate(post_tag(post["_id"]))
+            await log_action(username, EventType.POST_LIKED, f"Liked post {post['title']}", target=post["author_id"], post_id=post["_id"])
         elif action == "dislike":
-            await posts_collection.update_one(
-                {"_id": post["_id"]},
-                {"$inc": {"dislikes_count": 1}}
-            )
-            await log_action(username, f"Disliked post {post['title']}")
+            post_counters.incr(post["_id"], "dislikes_count")
+            post_cache.invalidate(post_tag(post["_id"]))
+            await log_action(username, EventType.POST_DISLIKED, f"Disliked post {post['title']}", target=post["author_id"], post_id=post["_id"])
         elif action == "comment":
-            comment_content = await generate_comment_content(post["title"],post["content"])
+            comment_content = await content_pool.take_comment(post["title"]) or await generate_comment_content(post["title"],post["content"])
             comment_data = {
                 "post_id": post["_id"],
                 "author_id": username,
@@ -108,12 +119,10 @@ async def interact_with_posts(username: str):
                 "comments": []
             }
             result = await comments_collection.insert_one(comment_data)
-            await posts_collection.update_one(
-                {"_id": post["_id"]},
-                {"$inc": {"comments_count": 1},
-                 "$push": {"comments": str(result.inserted_id)}}
-            )
-            await log_action(username, f"Commented on post {post['title']}: {comment_content}")
+            post_counters.incr(post["_id"], "comments_count")
+            post_counters.push(post["_id"], "comments", str(result.inserted_id))
+            post_cache.invalidate(post_tag(post["_id"]))
+            await log_action(username, EventType.COMMENTED, f"Commented on post {post['title']}: {comment_content}", target=post["author_id"], post_id=post["_id"], comment_id=result.inserted_id)
 
 def schedule_post_creation(username: str):
     for i in range(5):  # Schedule 5 posts
@@ -128,3 +137,6 @@ def schedule_interactions(username: str):
 
 def schedule_analysis():
     scheduler.add_job(analyze_interactions, 'interval', minutes=3, misfire_grace_time=60)
+
+def schedule_retention():
+    scheduler.add_job(run_retention, 'interval', hours=6, misfire_grace_time=600)
@@ -3,7 +3,10 @@ from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
 from utils.auth import get_current_user
 from services.database import users_collection, chats_collection, analysis_collection, detected_collection
+from services.detections import record_detection
+from services.pagination import PageParams, paginate
 from models.chat import ChatMessage, ChatCreate, ChatResponse
+from models.page import Page
 from models.user import UserResponse
 from typing import List
 from bson import ObjectId
@@ -86,7 +89,7 @@ async def websocket_chat(websocket: WebSocket, receiver_id: str, token: str):
                 })
                 
                 # Generate AI response
-                ai_response = generate_conversation(
+                ai_response = await generate_conversation(
                     message_data["message"],
                     analysis["conversation_history"]
                 )
@@ -100,7 +103,7 @@ async def websocket_chat(websocket: WebSocket, receiver_id: str, token: str):
                 await asyncio.sleep(delay)
                 # Check if enough exchanges for analysis
                 if len(analysis["conversation_history"]) >= 10:
-                    is_genuine = is_user_genuine(str(analysis["conversation_history"]))
+                    is_genuine = await is_user_genuine(str(analysis["conversation_history"]))
                     analysis["result"] = is_genuine
                     analysis["status"] = "completed"
                 
@@ -132,7 +135,7 @@ async def websocket_chat(websocket: WebSocket, receiver_id: str, token: str):
 @router.post("/analyze/{friend_id}")
 async def start_analysis(friend_id: str, user: UserResponse = Depends(get_current_user)):
     conversation_history = []
-    ai_message = generate_conversation("Hello!", conversation_history)
+    ai_message = await generate_conversation("Hello!", conversation_history)
     
     analysis_session = {
         "user_id": user.username,
@@ -168,19 +171,7 @@ async def get_analysis_result(friend_id: str, user: UserResponse = Depends(get_c
     
     if result and "result" in result:
         if result["result"] != "genuine":
-            existing_record = await detected_collection.find_one({"username": friend_id})
-            if existing_record:
-                if "Spammy chat content" not in existing_record["reasons"]:
-                    await detected_collection.update_one(
-                        {"username": friend_id},
-                        {"$push": {"reasons": f"Spammy chat content: detected as {result["result"]}"}}
-                    )
-            else:
-                await detected_collection.insert_one({
-                    "username": friend_id,
-                    "reasons": [f"Spammy chat content: detected as {result["result"]}"],
-                    "timestamp": datetime.utcnow().isoformat()
-                })
+            await record_detection(friend_id, f"Spammy chat content: detected as {result['result']}")
         return {
             "is_genuine": result["result"],
             "conversation_count": await analysis_collection.count_documents({
@@ -192,23 +183,31 @@ async def get_analysis_result(friend_id: str, user: UserResponse = Depends(get_c
     
     return {"status": "no_analysis_found"}
 
-@router.get("/detected-users")
-async def get_detected_users():
-    detected = await detected_collection.find(
-        {},
-        {"username": 1, "_id": 0}
-    ).sort("timestamp", -1).to_list(1000)
-    return detected
-
-@router.get("/messages/{friend_id}", response_model=List[ChatResponse])
-async def get_messages(friend_id: str, user: UserResponse = Depends(get_current_user)):
-    messages = await chats_collection.find({
+@router.get("/detected-users", response_model=Page[dict])
+async def get_detected_users(page: PageParams = Depends()):
+    # Newest first; _id order matches the insertion timestamp
+    detected, next_cursor, prev_cursor = await paginate(
+        detected_collection, {}, [("_id", -1)], page, projection={"username": 1}
+    )
+    return Page(
+        items=[{"username": user["username"]} for user in detected],
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor
+    )
+
+@router.get("/messages/{friend_id}", response_model=Page[ChatResponse])
+async def get_messages(friend_id: str, user: UserResponse = Depends(get_current_user), page: PageParams = Depends()):
+    messages, next_cursor, prev_cursor = await paginate(chats_collection, {
         "$or": [
             {"sender_id": user.username, "receiver_id": friend_id},
             {"sender_id": friend_id, "receiver_id": user.username}
         ]
-    }).sort("timestamp", 1).to_list(100)
-    return [ChatResponse(**message) for message in messages]
+    }, [("timestamp", 1), ("_id", 1)], page)
+    return Page(
+        items=[ChatResponse(**message) for message in messages],
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor
+    )
 
 @router.post("/messages", response_model=ChatResponse)
 async def send_message(chat_create: ChatCreate, user: UserResponse = Depends(get_current_user)):
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from models.comment import CommentCreate, CommentResponse
 from utils.auth import get_current_user
-from services.database import comments_collection, posts_collection, honeytraps_collection
+from services.database import comments_collection, posts_collection
+from services.honeytrap_roster import honeytrap_roster
+from services.cache import post_cache, post_tag
 from pymongo.errors import PyMongoError
 from bson import ObjectId
+from models.event import EventType
 from .log import log_action  # Import the log_action function
 from .chatbot import check_comment  # Import the check_comment function
 
@@ -15,13 +18,14 @@ async def create_comment(comment: CommentCreate, user: dict = Depends(get_curren
         comment_dict = comment.model_dump()
         comment_dict["author_id"] = user["username"]
         result = await comments_collection.insert_one(comment_dict)
+        post_cache.invalidate(post_tag(comment_dict["post_id"]))
 
         # Check if the comment is related to a honeytrap post
         post = await posts_collection.find_one({"_id": ObjectId(comment_dict["post_id"])})
         if post:
-            honeytrap = await honeytraps_collection.find_one({"username": post["author_id"]})
-            if honeytrap:
-                await log_action(user["username"], f"Commented {comment_dict['content']} on honeytrap post: {post['title']}")
+            if post["author_id"] in honeytrap_roster:
+                await log_action(user["username"], EventType.COMMENTED, f"Commented {comment_dict['content']} on honeytrap post: {post['title']}",
+                                 target=post["author_id"], post_id=comment_dict["post_id"], comment_id=result.inserted_id, content=comment_dict["content"])
                 await check_comment(str(result.inserted_id), user)
         return CommentResponse(**comment_dict, id=str(result.inserted_id))
     except PyMongoError as e:
@@ -50,6 +54,7 @@ async def delete_comment(comment_id: str, user: dict = Depends(get_current_user)
         if comment["author_id"] != user["username"]:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this comment")
         await comments_collection.delete_one({"_id": ObjectId(comment_id)})
+        post_cache.invalidate(post_tag(comment["post_id"]))
         return {"message": "Comment deleted successfully"}
     except PyMongoError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
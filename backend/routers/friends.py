@@ -1,10 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends
 from utils.auth import get_current_user
-from services.database import users_collection, honeytraps_collection
+from services.database import users_collection
+from services.honeytrap_roster import honeytrap_roster
 from pymongo.errors import PyMongoError
 from models.user import UserResponse
 from bson import ObjectId
 from typing import List
+from models.event import EventType
 from .log import log_action  # Import the log_action function
 
 router = APIRouter()
@@ -26,9 +28,8 @@ async def send_friend_request(friend_id: str, user: UserResponse = Depends(get_c
         )
 
         # Check if the friend request is related to a honeytrap user
-        honeytrap = await honeytraps_collection.find_one({"username": friend_id})
-        if honeytrap:
-            await log_action(user.username, f"Sent friend request to honeytrap user: {friend_id}")
+        if friend_id in honeytrap_roster:
+            await log_action(user.username, EventType.FRIEND_REQUEST_SENT, f"Sent friend request to honeytrap user: {friend_id}", target=friend_id)
 
         return {"message": "Friend request sent"}
     except PyMongoError as e:
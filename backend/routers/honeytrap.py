@@ -1,11 +1,28 @@
 import logging
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from models.honeytrap import HoneytrapCreate, HoneytrapResponse
+from models.event import EventType
+from models.page import Page
 from services.database import honeytraps_collection, users_collection, logs_collection, detected_collection
+from services.analysis_pool import analysis_pool
+from services.cache import post_cache
+from services.comment_model import comment_model
+from services.content_pool import content_pool
+from services.counters import post_counters
+from services.honeytrap_roster import honeytrap_roster
+from services.honeytrap_stats import honeytrap_stats
+from services.llm import llm_gateway
+from services.log_writer import log_writer
+from services.pagination import PageParams, paginate
+from services.rate_detector import rate_detector
+from services.rollups import BUCKET_SIZES, MAX_POINTS, activity_rollups, naive_utc
+from services.verdict_cache import verdict_cache
 from utils.auth import get_current_user
-from typing import List
+from typing import List, Literal, Optional
+from pymongo import errors
+import datetime
 from routers.automate import *
-from routers.chatbot import generate_realistic_email, generate_realistic_username
+from routers.chatbot import comment_batcher, generate_realistic_email, generate_realistic_username
 
 router = APIRouter()
 
@@ -14,7 +31,7 @@ logging.basicConfig(level=logging.INFO)
 @router.post("/create", response_model=HoneytrapResponse)
 async def create_honeytrap(honeytrap: HoneytrapCreate, background_tasks: BackgroundTasks):
     try:
-        username = await generate_realistic_username(honeytrap.purpose)
+        username = await content_pool.take_username(honeytrap.purpose) or await generate_realistic_username(honeytrap.purpose)
         email = await generate_realistic_email(username)
         honeytrap_data = {
             "purpose": honeytrap.purpose,
@@ -24,6 +41,8 @@ async def create_honeytrap(honeytrap: HoneytrapCreate, background_tasks: Backgro
             "friend_requests": []
         }
         result = await honeytraps_collection.insert_one(honeytrap_data)
+        honeytrap_roster.add(username)
+        honeytrap_stats.honeytrap_created()
         honeytrap_data["id"] = str(result.inserted_id)
         await users_collection.insert_one(honeytrap_data)  # Add to users collection as well
 
@@ -46,69 +65,71 @@ async def get_honeypots():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-@router.get("/logs/{username}", response_model=List[dict])
-async def get_honeytrap_logs(username: str):
+@router.get("/logs/{username}", response_model=Page[dict])
+async def get_honeytrap_logs(username: str, page: PageParams = Depends()):
     try:
-        logs = await logs_collection.find({"username": username}).to_list(length=100)
+        # Both what the honeytrap did and what others did to it
+        query = {"$or": [{"actor": username}, {"target": username}]}
+        logs, next_cursor, prev_cursor = await paginate(logs_collection, query, [("ts", 1), ("_id", 1)], page)
         for log in logs:
             log["_id"] = str(log["_id"])
-        return logs
+        return Page(items=logs, next_cursor=next_cursor, prev_cursor=prev_cursor)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-@router.get("/detected", response_model=List[dict])
-async def get_detected_users():
+@router.get("/detected", response_model=Page[dict])
+async def get_detected_users(page: PageParams = Depends()):
     try:
-        detected_users = await detected_collection.find().to_list(length=100)
+        detected_users, next_cursor, prev_cursor = await paginate(detected_collection, {}, [("_id", 1)], page)
         for user in detected_users:
             user["_id"] = str(user["_id"])
-        return detected_users
+        return Page(items=detected_users, next_cursor=next_cursor, prev_cursor=prev_cursor)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-@router.get("/statistics")
-async def get_honeytrap_statistics():
-    try:
-        honeytrap_usernames = [honeytrap["username"] for honeytrap in await honeytraps_collection.find().to_list(length=1000)]
-        
-        total_honeytraps = await honeytraps_collection.count_documents({})
-        total_interactions = await logs_collection.count_documents({"username": {"$in": honeytrap_usernames}})
-        total_posts = await posts_collection.count_documents({"author_id": {"$in": honeytrap_usernames}})
-        total_likes = await posts_collection.aggregate([
-            {"$match": {"author_id": {"$in": honeytrap_usernames}}},
-            {"$group": {"_id": None, "total_likes": {"$sum": "$likes_count"}}}
-        ]).to_list(length=1)
-        total_comments = await posts_collection.aggregate([
-            {"$match": {"author_id": {"$in": honeytrap_usernames}}},
-            {"$group": {"_id": None, "total_comments": {"$sum": "$comments_count"}}}
-        ]).to_list(length=1)
-        total_friend_requests = await logs_collection.count_documents({"username": {"$in": honeytrap_usernames}, "action": {"$regex": "Sent friend request"}})
-        total_detected_users = await detected_collection.count_documents({})
-
-        most_active_honeytrap = await logs_collection.aggregate([
-            {"$match": {"username": {"$in": honeytrap_usernames}}},
-            {"$group": {"_id": "$username", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 1}
-        ]).to_list(length=1)
-        most_liked_post = await posts_collection.find({"author_id": {"$in": honeytrap_usernames}}).sort("likes_count", -1).limit(1).to_list(length=1)
-        most_commented_post = await posts_collection.find({"author_id": {"$in": honeytrap_usernames}}).sort("comments_count", -1).limit(1).to_list(length=1)
+@router.get("/metrics")
+async def get_metrics():
+    return {
+        "log_writer": log_writer.stats(),
+        "post_counters": post_counters.stats(),
+        "post_cache": post_cache.stats(),
+        "rate_detector": rate_detector.stats(),
+        "honeytrap_stats": honeytrap_stats.stats(),
+        "activity_rollups": activity_rollups.stats(),
+        "analysis_pool": analysis_pool.stats(),
+        "llm": llm_gateway.stats(),
+        "verdict_cache": verdict_cache.stats(),
+        "comment_batcher": comment_batcher.stats(),
+        "comment_model": comment_model.stats(),
+        "content_pool": content_pool.stats(),
+    }
 
-        statistics = [
-            {"name": "Total Honeytraps", "value": total_honeytraps},
-            {"name": "Total Interactions", "value": total_interactions},
-            {"name": "Total Posts by Honeytraps", "value": total_posts},
-            {"name": "Total Likes on Honeytrap Posts", "value": total_likes[0]["total_likes"] if total_likes else 0},
-            {"name": "Total Comments on Honeytrap Posts", "value": total_comments[0]["total_comments"] if total_comments else 0},
-            {"name": "Total Friend Requests Sent by Honeytraps", "value": total_friend_requests},
-            {"name": "Total Detected Users", "value": total_detected_users},
-            {"name": "Most Active Honeytrap", "value": most_active_honeytrap[0]["_id"] if most_active_honeytrap else "N/A"},
-            {"name": "Most Liked Honeytrap Post", "value": most_liked_post[0]["title"] if most_liked_post else "N/A"},
-            {"name": "Most Commented Honeytrap Post", "value": most_commented_post[0]["title"] if most_commented_post else "N/A"},
-        ]
+@router.get("/timeseries")
+async def get_activity_timeseries(
+    key: str,
+    dimension: Literal["honeytrap", "actor", "type"] = "honeytrap",
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    granularity: Optional[Literal["minute", "hour", "day"]] = None
+):
+    # Naive UTC throughout, like the stored buckets
+    end = naive_utc(end) if end else datetime.datetime.utcnow()
+    start = naive_utc(start) if start else end - datetime.timedelta(hours=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'start' must be before 'end'")
+    if granularity and (end - start) / BUCKET_SIZES[granularity] > MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"Range too long for {granularity} buckets (max {MAX_POINTS} points)")
+    try:
+        return await activity_rollups.timeseries(dimension, key, start, end, granularity)
+    except errors.PyMongoError as e:
+        raise HTTPException(status_code=500, detail="Database error")
 
-        return statistics
+@router.get("/statistics")
+async def get_honeytrap_statistics(fresh: bool = False):
+    try:
+        return await honeytrap_stats.statistics(fresh)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-schedule_analysis()
\ No newline at end of file
+schedule_analysis()
+schedule_retention()
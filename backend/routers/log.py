@@ -1,12 +1,28 @@
 import random
 import datetime
-from services.database import logs_collection
+from typing import Optional
+from models.event import EventType, InteractionEvent
+from services.honeytrap_stats import honeytrap_stats
+from services.log_writer import log_writer
+from services.rollups import activity_rollups
+from services.rate_detector import rate_detector
 
-async def log_action(username: str, action: str):
-    log_entry = {
-        "username": username,
-        "action": action,
-        "timestamp": datetime.datetime.now().isoformat()
-    }
-    await logs_collection.insert_one(log_entry)
-    
+async def log_action(actor: str, type: EventType, action: str, target: Optional[str] = None,
+                     post_id: Optional[str] = None, comment_id: Optional[str] = None, content: Optional[str] = None):
+    log_entry = InteractionEvent(
+        type=type,
+        actor=actor,
+        action=action,
+        ts=datetime.datetime.utcnow(),
+        target=target,
+        post_id=None if post_id is None else str(post_id),
+        comment_id=None if comment_id is None else str(comment_id),
+        content=content
+    ).model_dump(exclude_none=True)
+    # Flagged in memory as soon as a user crosses the rate threshold, instead of
+    # waiting for the next scheduled analysis
+    rate_detector.observe(actor)
+    honeytrap_stats.observe(log_entry)
+    activity_rollups.observe(log_entry)
+    # Queued and written in batches off the request path
+    await log_writer.submit(log_entry)
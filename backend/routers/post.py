@@ -1,22 +1,35 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Body
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, status, Body, Query, Response
+from typing import List, Literal
 from models.post import PostCreate, PostResponse
+from models.page import Page
 from models.comment import Comment, CommentCreate, CommentResponse
 from models.user import UserResponse
 from utils.auth import get_current_user
-from services.database import posts_collection, comments_collection, honeytraps_collection
+from services.database import posts_collection, comments_collection
+from services.honeytrap_roster import honeytrap_roster
+from services.cache import POSTS_LIST_TAG, post_cache, post_tag
+from services.counters import post_counters
+from services.likes import add_like, remove_like
+from services.feed import fan_out_post, read_feed
+from services.pagination import PageParams, encode_cursor, paginate
+from services.trending import normalize_hashtag, record_hashtags, trending_hashtags
+from services.posts import DEFAULT_COMMENTS_LIMIT, build_post_response, build_post_responses, load_comments
 from pymongo import errors
-from bson import ObjectId
+from bson import ObjectId, errors as bson_errors
+from models.event import EventType
 from .log import log_action  # Import the log_action function
 from .chatbot import check_comment
 import datetime
 
 router = APIRouter()
 
+FEED_SORT = [("_id", -1)]
+
 @router.post("/create", response_model=PostResponse)
 async def create_post(post: PostCreate, user: UserResponse = Depends(get_current_user)):
     try:
         post_dict = post.model_dump()
+        post_dict["hashtags"] = list(dict.fromkeys(filter(None, map(normalize_hashtag, post.hashtags))))
         post_dict["author_id"] = user.username
         post_dict["created_at"] = datetime.datetime.now().isoformat()
         post_dict["updated_at"] = datetime.datetime.now().isoformat()
@@ -24,67 +37,83 @@ async def create_post(post: PostCreate, user: UserResponse = Depends(get_current
         post_dict["dislikes_count"] = 0
         post_dict["comments_count"] = 0
         post_dict["comments"] = []
+        post_dict["honeytrap"] = False
         result = await posts_collection.insert_one(post_dict)
+        await fan_out_post(result.inserted_id, user.username, user.friends)
+        await record_hashtags(post_dict["hashtags"])
+        post_cache.invalidate(POSTS_LIST_TAG)
         return PostResponse(**post_dict, id=str(result.inserted_id))
     except errors.PyMongoError as e:
         raise HTTPException(status_code=500, detail="Database error")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/posts", response_model=List[PostResponse])
-async def get_posts():
+@router.get("/posts", response_model=Page[PostResponse])
+async def get_posts(page: PageParams = Depends(), comments_limit: int = Query(DEFAULT_COMMENTS_LIMIT, ge=0, le=500)):
+    key = f"posts:{page.limit}:{page.after}:{page.before}:{comments_limit}"
+    body = post_cache.get(key)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
+    try:
+        generation = post_cache.generation
+        posts, next_cursor, prev_cursor = await paginate(posts_collection, {}, [("_id", 1)], page)
+        items = await build_post_responses(posts, comments_limit)
+        body = Page(items=items, next_cursor=next_cursor, prev_cursor=prev_cursor).model_dump_json(by_alias=True).encode()
+        post_cache.set(key, body, [POSTS_LIST_TAG, *(post_tag(item.id) for item in items)], generation)
+        return Response(content=body, media_type="application/json")
+    except errors.PyMongoError as e:
+        raise HTTPException(status_code=500, detail="Database error")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/feed", response_model=Page[PostResponse])
+async def get_feed(page: PageParams = Depends(), comments_limit: int = Query(DEFAULT_COMMENTS_LIMIT, ge=0, le=500), user: UserResponse = Depends(get_current_user)):
+    if page.before:
+        raise HTTPException(status_code=400, detail="The feed can only be paged forward with 'after'")
     try:
-        posts = await posts_collection.find().to_list(100)
-        post_responses = []
-        for post in posts:
-            comments = await comments_collection.find({"post_id": str(post["_id"])}).to_list(100)
-            comment_responses = [
-                Comment(
-                    **{k: str(v) if isinstance(v, ObjectId) else v for k, v in comment.items()},
-                    id=str(comment["_id"])
-                ) 
-                for comment in comments
-            ]
-            post_responses.append(PostResponse(
-                id=str(post["_id"]),
-                title=post["title"],
-                author_id=post["author_id"],
-                content=post["content"],
-                hashtags=post["hashtags"],
-                pictures=post.get("pictures", []),
-                videos=post.get("videos", []),
-                likes_count=post["likes_count"],
-                dislikes_count=post["dislikes_count"],
-                comments_count=post["comments_count"],
-                comments=comment_responses
-            ))
-        return post_responses
+        after = page.values[0] if page.values else None
+        posts, has_more = await read_feed(user.username, user.friends, page.limit, after)
+        items = await build_post_responses(posts, comments_limit)
+        next_cursor = encode_cursor(posts[-1], FEED_SORT) if has_more and posts else None
+        return Page(items=items, next_cursor=next_cursor)
     except errors.PyMongoError as e:
         raise HTTPException(status_code=500, detail="Database error")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/tag/{tag}", response_model=Page[PostResponse])
+async def get_tag_posts(tag: str, page: PageParams = Depends(), comments_limit: int = Query(DEFAULT_COMMENTS_LIMIT, ge=0, le=500)):
+    try:
+        posts, next_cursor, prev_cursor = await paginate(posts_collection, {"hashtags": normalize_hashtag(tag)}, [("_id", -1)], page)
+        items = await build_post_responses(posts, comments_limit)
+        return Page(items=items, next_cursor=next_cursor, prev_cursor=prev_cursor)
+    except errors.PyMongoError as e:
+        raise HTTPException(status_code=500, detail="Database error")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/trending")
+async def get_trending_tags(window: Literal["hour", "day"] = "hour", limit: int = Query(10, ge=1, le=100)):
+    try:
+        return await trending_hashtags(window, limit)
+    except errors.PyMongoError as e:
+        raise HTTPException(status_code=500, detail="Database error")
+
 @router.get("/post/{post_id}", response_model=PostResponse)
-async def get_post(post_id: str):
+async def get_post(post_id: str, comments_limit: int = Query(DEFAULT_COMMENTS_LIMIT, ge=0, le=500)):
+    key = f"post:{post_id}:{comments_limit}"
+    body = post_cache.get(key)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
     try:
+        generation = post_cache.generation
         post = await posts_collection.find_one({"_id": ObjectId(post_id)})
         if not post:
             raise HTTPException(status_code=404, detail="Post not found")
-        comments = await comments_collection.find({"post_id": post_id}).to_list(100)
-        comment_responses = [Comment(**comment, id=str(comment["_id"])) for comment in comments]
-        return PostResponse(
-            id=str(post["_id"]),
-            title=post["title"],
-            author_id=post["author_id"],
-            content=post["content"],
-            hashtags=post["hashtags"],
-            pictures=post.get("pictures", []),
-            videos=post.get("videos", []),
-            likes_count=post["likes_count"],
-            dislikes_count=post["dislikes_count"],
-            comments_count=post["comments_count"],
-            comments=comment_responses
-        )
+        comments = await load_comments([post_id], comments_limit)
+        body = build_post_response(post, comments[post_id]).model_dump_json(by_alias=True).encode()
+        post_cache.set(key, body, [post_tag(post_id)], generation)
+        return Response(content=body, media_type="application/json")
     except errors.InvalidId:
         raise HTTPException(status_code=400, detail="Invalid post ID")
     except errors.PyMongoError as e:
@@ -92,29 +121,12 @@ async def get_post(post_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-@router.get("/user/{author_id}", response_model=List[PostResponse])
-async def get_post(author_id):
+@router.get("/user/{author_id}", response_model=Page[PostResponse])
+async def get_user_posts(author_id, page: PageParams = Depends(), comments_limit: int = Query(DEFAULT_COMMENTS_LIMIT, ge=0, le=500)):
     try:
-        cursor = posts_collection.find({"author_id": author_id})
-        posts = await cursor.to_list(100)
-        post_responses = []
-        for post in posts:
-            comments = await comments_collection.find({"post_id": str(post["_id"])}).to_list(100)
-            comment_responses = [Comment(**comment, id=str(comment["_id"])) for comment in comments]
-            post_responses.append(PostResponse(
-                id=str(post["_id"]),
-                title=post["title"],
-                author_id=post["author_id"],
-                content=post["content"],
-                hashtags=post["hashtags"],
-                pictures=post.get("pictures", []),
-                videos=post.get("videos", []),
-                likes_count=post["likes_count"],
-                dislikes_count=post["dislikes_count"],
-                comments_count=post["comments_count"],
-                comments=comment_responses
-            ))
-        return post_responses
+        posts, next_cursor, prev_cursor = await paginate(posts_collection, {"author_id": author_id}, [("_id", 1)], page)
+        items = await build_post_responses(posts, comments_limit)
+        return Page(items=items, next_cursor=next_cursor, prev_cursor=prev_cursor)
     except errors.InvalidURI:
         raise HTTPException(status_code=400, detail="Invalid post ID")
     except errors.PyMongoError as e:
@@ -122,23 +134,31 @@ async def get_post(author_id):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return post_cache.stats()
+
 @router.post("/like/{post_id}")
 async def like_post(post_id: str, user: UserResponse = Depends(get_current_user)):
     try:
-        post = await posts_collection.find_one({"_id": ObjectId(post_id)})
-        if not post:
-            raise HTTPException(status_code=404, detail="Post not found")
-        await posts_collection.update_one(
-            {"_id": ObjectId(post_id)},
-            {"$inc": {"likes_count": 1}}
-        )
-
-        # Check if the like is related to a honeytrap post
-        honeytrap = await honeytraps_collection.find_one({"username": post["author_id"]})
-        if honeytrap:
-            await log_action(user.username, f"Liked honeytrap post: {post['title']}")
-
+        await add_like(post_id, user.username)
         return {"message": "Post liked"}
+    except bson_errors.InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid post ID")
+    except HTTPException:
+        raise
+    except errors.PyMongoError as e:
+        raise HTTPException(status_code=500, detail="Database error")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/unlike/{post_id}")
+async def unlike_post(post_id: str, user: UserResponse = Depends(get_current_user)):
+    try:
+        await remove_like({"post_id": post_id, "user_id": user.username}, user.username)
+        return {"message": "Post unliked"}
+    except HTTPException:
+        raise
     except errors.PyMongoError as e:
         raise HTTPException(status_code=500, detail="Database error")
     except Exception as e:
@@ -150,15 +170,12 @@ async def dislike_post(post_id: str, user: UserResponse = Depends(get_current_us
         post = await posts_collection.find_one({"_id": ObjectId(post_id)})
         if not post:
             raise HTTPException(status_code=404, detail="Post not found")
-        await posts_collection.update_one(
-            {"_id": ObjectId(post_id)},
-            {"$inc": {"dislikes_count": 1}}
-        )
+        post_counters.incr(post["_id"], "dislikes_count")
+        post_cache.invalidate(post_tag(post_id))
 
         # Check if the dislike is related to a honeytrap post
-        honeytrap = await honeytraps_collection.find_one({"username": post["author_id"]})
-        if honeytrap:
-            await log_action(user.username, f"Disliked honeytrap post: {post['title']}")
+        if post["author_id"] in honeytrap_roster:
+            await log_action(user.username, EventType.POST_DISLIKED, f"Disliked honeytrap post: {post['title']}", target=post["author_id"], post_id=post_id)
 
         return {"message": "Post disliked"}
     except errors.PyMongoError as e:
@@ -179,16 +196,14 @@ async def comment_post(post_id: str, comment: str = Body(..., embed=True), user:
             "created_at": datetime.datetime.now().isoformat()
         }
         result = await comments_collection.insert_one(comment_dict)
-        await posts_collection.update_one(
-            {"_id": ObjectId(post_id)},
-            {"$inc": {"comments_count": 1},
-             "$push": {"comments": str(result.inserted_id)}}
-        )
+        post_counters.incr(post["_id"], "comments_count")
+        post_counters.push(post["_id"], "comments", str(result.inserted_id))
+        post_cache.invalidate(post_tag(post_id))
 
         # Check if the comment is related to a honeytrap post
-        honeytrap = await honeytraps_collection.find_one({"username": post["author_id"]})
-        if honeytrap:
-            await log_action(user.username, f"Commented {comment} on honeytrap post: {post['title']}")
+        if post["author_id"] in honeytrap_roster:
+            await log_action(user.username, EventType.COMMENTED, f"Commented {comment} on honeytrap post: {post['title']}",
+                             target=post["author_id"], post_id=post_id, comment_id=result.inserted_id, content=comment)
             await check_comment(str(result.inserted_id), user.username)
         return {"message": "Comment added", "comment_id": str(result.inserted_id)}
     except errors.PyMongoError as e:
@@ -0,0 +1,122 @@
+import asyncio
+import multiprocessing
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from services import detectors_numpy
+from services.detectors import (
+    HIGH_FREQUENCY_REASON, SPAMMY_CONTENT_REASON, TIME_PATTERN_REASON,
+    analyse_events, is_spammy_comment
+)
+
+# Detector runs are split into shards of users by crc32(username), which is stable
+# across processes (unlike hash()), and each shard is analysed in a worker process.
+# Every detector only looks at one user's own events, so shards never need each
+# other's data. This module is imported by the spawned workers, so it must not import
+# anything that opens a database connection.
+#
+# By default one core is left to the API; 0 workers runs the shards inline on the
+# event loop, as before.
+ANALYSER_WORKERS = int(os.getenv("ANALYSER_WORKERS", str(max(0, (os.cpu_count() or 1) - 1))))
+
+def shard_of(username: str, shards: int) -> int:
+    return zlib.crc32(username.encode()) % shards
+
+class FlagSet(dict):
+    """username -> reasons, filled through the same `flag` call as a DetectionSink."""
+
+    def flag(self, username: str, reason: str):
+        reasons = self.setdefault(username, [])
+        if reason not in reasons:
+            reasons.append(reason)
+
+def analyse_shard(logs: List[dict], states: Dict[str, dict]) -> Tuple[FlagSet, Dict[str, dict]]:
+    # Incremental detectors: the per-user state has to come back to be persisted
+    flags = FlagSet()
+    analyse_events(logs, states, flags)
+    return flags, states
+
+def analyse_history_shard(usernames: List[str], timestamps: List, comments: List[Tuple[str, str]]) -> FlagSet:
+    # Vectorized detectors over a shard of the full history; only flags come back
+    events = detectors_numpy.EventArrays()
+    events.extend(usernames, timestamps)
+    flags = FlagSet()
+    for reason, users in (
+        (HIGH_FREQUENCY_REASON, detectors_numpy.find_high_frequency_users(events)),
+        (SPAMMY_CONTENT_REASON, {username for username, content in comments if is_spammy_comment(content)}),
+        (TIME_PATTERN_REASON, detectors_numpy.find_time_pattern_users(events)),
+    ):
+        for username in users:
+            flags.flag(username, reason)
+    return flags
+
+class AnalysisPool:
+    """
+    Process pool the analyser runs its detector shards on.
+
+    Workers are spawned rather than forked so they do not inherit the API's Mongo
+    client and event loop. Only shard inputs and results cross the process boundary;
+    the event loop just awaits the futures, so a long analysis run no longer takes
+    CPU time from API requests.
+    """
+
+    def __init__(self, workers: int = ANALYSER_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.runs = 0
+        self.tasks = 0
+        self.seconds = 0.0
+
+    @property
+    def shards(self) -> int:
+        return self.workers if self._executor is not None else 1
+
+    def split(self, usernames: Sequence[str]) -> List[List[int]]:
+        """Indexes of `usernames` per shard."""
+        shards = [[] for _ in range(self.shards)]
+        if len(shards) == 1:
+            shards[0] = list(range(len(usernames)))
+            return shards
+        count = len(shards)
+        for i, username in enumerate(usernames):
+            shards[shard_of(username, count)].append(i)
+        return shards
+
+    async def map(self, fn: Callable, shards: List[tuple]) -> list:
+        """
+        Runs `fn(*args)` for every shard's args, in the workers if the pool is started.
+
+        Args:
+            fn (callable): A module-level function of this module, so it can be pickled.
+            shards (list): One argument tuple per shard.
+
+        Returns:
+            list: The results, in shard order.
+        """
+        started = time.perf_counter()
+        if self._executor is None:
+            results = [fn(*args) for args in shards]
+        else:
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(*(loop.run_in_executor(self._executor, fn, *args) for args in shards))
+        self.runs += 1
+        self.tasks += len(shards)
+        self.seconds += time.perf_counter() - started
+        return results
+
+    def start(self):
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def stop(self):
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.get_running_loop().run_in_executor(None, lambda: executor.shutdown(cancel_futures=True))
+
+    def stats(self) -> dict:
+        return {"workers": self.workers if self._executor is not None else 0, "runs": self.runs,
+                "tasks": self.tasks, "seconds": round(self.seconds, 3)}
+
+analysis_pool = AnalysisPool()
@@ -0,0 +1,108 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set
+
+class ResponseCache:
+    """
+    In-process LRU + TTL cache of serialized response bodies.
+
+    Entries carry tags (e.g. "post:<id>") so writes can invalidate exactly the
+    responses that contain the changed document. Readers take a generation token
+    before touching the database and pass it to `set`; if one of the body's tags was
+    invalidated in between, the possibly stale body is not stored. Invalidations of
+    other tags do not affect it, so a busy write path only discards the readers of
+    the documents it changed.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 30.0, max_tracked_tags: int = 4096):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_tracked_tags = max_tracked_tags
+        self._entries: "OrderedDict[str, tuple[float, bytes, tuple[str, ...]]]" = OrderedDict()
+        self._keys_by_tag: Dict[str, Set[str]] = {}
+        self.generation = 0
+        # Generation of each tag's latest invalidation, oldest first; tags dropped to
+        # bound it are covered by _forgotten_generation
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten_generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, body, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def set(self, key: str, body: bytes, tags: Iterable[str] = (), generation: Optional[int] = None):
+        tags = tuple(tags)
+        if generation is not None and self._invalidated_since(generation, tags):
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, body, tags)
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _invalidated_since(self, generation: int, tags: tuple) -> bool:
+        if generation < self._forgotten_generation:
+            return True
+        return any(self._invalidated.get(tag, 0) > generation for tag in tags)
+
+    def invalidate(self, *tags: str):
+        self.generation += 1
+        for tag in tags:
+            self._invalidated[tag] = self.generation
+            self._invalidated.move_to_end(tag)
+        while len(self._invalidated) > self.max_tracked_tags:
+            _, self._forgotten_generation = self._invalidated.popitem(last=False)
+        for tag in tags:
+            for key in self._keys_by_tag.pop(tag, set()):
+                if key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def _remove(self, key: str):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+def post_tag(post_id) -> str:
+    return f"post:{post_id}"
+
+# Tag for every cached page of the post listing; bumped when posts are added
+POSTS_LIST_TAG = "posts"
+
+post_cache = ResponseCache()
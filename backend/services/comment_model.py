@@ -0,0 +1,307 @@
+# Local first stage of comment classification: a logistic model over hashed word and
+# character n-grams scores each honeytrap comment, and only comments scoring inside
+# the uncertain band (COMMENT_MODEL_LOW, COMMENT_MODEL_HIGH) are escalated to the LLM.
+# The model is trained offline and loaded at startup. Retrain from backend/:
+#   python -m services.comment_model train [--labelled comments.ndjson] [--no-mongo]
+#   python -m services.comment_model score "some comment"
+#
+# Labelled files hold one {"text": ..., "label": "yes"|"no"|1|0} object per line.
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import random
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from bson import ObjectId
+from models.event import EventType
+from services.database import comments_collection, detected_collection, logs_collection, verdicts_collection
+from services.detectors import SPAMMY_CONTENT_REASON
+from services.verdict_cache import normalize_comment
+
+logger = logging.getLogger(__name__)
+
+COMMENT_MODEL_PATH = os.getenv("COMMENT_MODEL_PATH", "comment_model.npz")
+COMMENT_MODEL_LOW = os.getenv("COMMENT_MODEL_LOW")
+COMMENT_MODEL_HIGH = os.getenv("COMMENT_MODEL_HIGH")
+DEFAULT_BAND = (0.1, 0.9)
+HASH_BITS = 18
+MAX_CHARS = 500
+CHAR_NGRAMS = (3, 4)
+
+def features(text: str, bits: int = HASH_BITS) -> np.ndarray:
+    """
+    Hashed feature indexes of a comment: words, word bigrams and character n-grams
+    of the normalized text (see verdict_cache.normalize_comment), deduplicated.
+    """
+    normalized = normalize_comment(text)[:MAX_CHARS]
+    words = normalized.split()
+    tokens = {f"w:{word}" for word in words}
+    tokens.update(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+    padded = f" {normalized} "
+    for n in CHAR_NGRAMS:
+        tokens.update(f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1))
+    mask = (1 << bits) - 1
+    return np.fromiter((zlib.crc32(token.encode()) & mask for token in tokens), dtype=np.int64, count=len(tokens))
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+class CommentModel:
+    """
+    Calibrated spam score for comments, in [0, 1].
+
+    The linear model's raw output is mapped through a Platt scaling fitted on a
+    held-out calibration split, so scores can be read as probabilities when picking
+    the band.
+    Without a model file every comment is escalated.
+    """
+
+    def __init__(self, path: str = COMMENT_MODEL_PATH):
+        self.path = path
+        self.weights: Optional[np.ndarray] = None
+        self.bias = 0.0
+        self.scale = (1.0, 0.0)
+        self.bits = HASH_BITS
+        self.band = DEFAULT_BAND
+        self.meta: dict = {}
+        self.scored = 0
+        self.allowed = 0
+        self.blocked = 0
+        self.escalated = 0
+        self.seconds = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self.weights is not None
+
+    def load(self, path: Optional[str] = None) -> bool:
+        path = path or self.path
+        if not os.path.exists(path):
+            logger.info(f"No comment model at {path}; every comment goes to the LLM")
+            return False
+        with np.load(path, allow_pickle=False) as data:
+            self.weights = data["weights"]
+            self.bias = float(data["bias"])
+            self.scale = tuple(float(value) for value in data["scale"])
+            self.meta = json.loads(str(data["meta"]))
+        self.bits = int(self.meta.get("bits", HASH_BITS))
+        low, high = self.meta.get("band", DEFAULT_BAND)
+        self.band = (float(COMMENT_MODEL_LOW or low), float(COMMENT_MODEL_HIGH or high))
+        logger.info(f"Loaded comment model trained at {self.meta.get('trained_at')}, band {self.band}")
+        return True
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path, weights=self.weights, bias=np.float64(self.bias), scale=np.array(self.scale),
+            meta=np.array(json.dumps({**self.meta, "bits": self.bits, "band": list(self.band)}))
+        )
+        os.replace(tmp_path, path)
+
+    def _raw(self, indexes: np.ndarray) -> float:
+        return float(self.weights[indexes].sum()) + self.bias
+
+    def score(self, text: str) -> float:
+        a, b = self.scale
+        return float(_sigmoid(a * self._raw(features(text, self.bits)) + b))
+
+    def verdict(self, text: str) -> Tuple[Optional[str], Optional[float]]:
+        """
+        First-stage verdict for a comment.
+
+        Returns:
+            tuple: ("yes" | "no" | None, score). None means the comment is in the
+                uncertain band (or there is no model) and should go to the LLM.
+        """
+        if not self.loaded:
+            self.escalated += 1
+            return None, None
+        started = time.perf_counter()
+        score = self.score(text)
+        self.seconds += time.perf_counter() - started
+        self.scored += 1
+        low, high = self.band
+        if score <= low:
+            self.allowed += 1
+            return "no", score
+        if score >= high:
+            self.blocked += 1
+            return "yes", score
+        self.escalated += 1
+        return None, score
+
+    def fit(self, texts: List[str], labels: List[int], epochs: int = 5, learning_rate: float = 0.2,
+            l2: float = 1e-6, holdout: float = 0.2, seed: int = 7) -> dict:
+        """
+        Trains the model with SGD on log loss, balancing the two classes. A
+        `holdout` share of the examples is kept out of training and split in two
+        halves: the Platt scaling is fitted on one, and the metrics are measured on
+        the other, which neither the weights nor the scaling have seen.
+
+        Returns:
+            dict: Evaluation-split metrics at the current band.
+        """
+        rng = random.Random(seed)
+        order = list(range(len(texts)))
+        rng.shuffle(order)
+        held = min(max(2, int(len(order) * holdout)), len(order) - 1) if len(order) > 2 else 0
+        train = order[:len(order) - held]
+        calibration = order[len(order) - held:len(order) - held // 2]
+        evaluation = order[len(order) - held // 2:]
+        if not held:
+            # Too few examples to hold any out: calibrate and report on the training set
+            calibration = evaluation = train
+        rows = [features(text, self.bits) for text in texts]
+        y = np.array(labels, dtype=np.float64)
+        positives = max(1.0, y[train].sum())
+        negatives = max(1.0, len(train) - y[train].sum())
+        class_weight = {1: len(train) / (2 * positives), 0: len(train) / (2 * negatives)}
+
+        weights = np.zeros(1 << self.bits, dtype=np.float64)
+        bias = 0.0
+        step = 0
+        for _ in range(epochs):
+            rng.shuffle(train)
+            for i in train:
+                step += 1
+                rate = learning_rate / (1 + step * 1e-5)
+                indexes = rows[i]
+                p = _sigmoid(weights[indexes].sum() + bias)
+                gradient = (p - y[i]) * class_weight[int(y[i])]
+                weights[indexes] -= rate * (gradient + l2 * weights[indexes])
+                bias -= rate * gradient
+        self.weights = weights.astype(np.float32)
+        self.bias = bias
+
+        raw = np.array([self._raw(rows[i]) for i in calibration])
+        a, b = 1.0, 0.0
+        for _ in range(500):
+            p = _sigmoid(a * raw + b)
+            a -= 0.05 * float(np.mean((p - y[calibration]) * raw))
+            b -= 0.05 * float(np.mean(p - y[calibration]))
+        self.scale = (a, b)
+
+        scores = _sigmoid(a * np.array([self._raw(rows[i]) for i in evaluation]) + b)
+        low, high = self.band
+        decided = (scores <= low) | (scores >= high)
+        predicted = scores >= high
+        truth = y[evaluation] == 1
+        metrics = {
+            "examples": len(texts),
+            "positives": int(y.sum()),
+            "calibration": len(calibration),
+            "evaluated": len(evaluation),
+            "escalation_rate": float(1 - decided.mean()) if len(evaluation) else 0.0,
+            "decided_accuracy": float((predicted[decided] == truth[decided]).mean()) if decided.any() else 0.0,
+            "precision": float(truth[predicted].mean()) if predicted.any() else 0.0,
+            "recall": float(predicted[truth].mean()) if truth.any() else 0.0,
+        }
+        self.meta = {"trained_at": datetime.datetime.utcnow().isoformat(), "metrics": metrics}
+        return metrics
+
+    def stats(self) -> dict:
+        total = self.allowed + self.blocked + self.escalated
+        return {
+            "loaded": self.loaded,
+            "trained_at": self.meta.get("trained_at"),
+            "band": list(self.band),
+            "scored": self.scored,
+            "allowed": self.allowed,
+            "blocked": self.blocked,
+            "escalated": self.escalated,
+            "escalation_rate": self.escalated / total if total else 0.0,
+            "avg_score_us": round(self.seconds / self.scored * 1e6, 1) if self.scored else 0.0,
+        }
+
+comment_model = CommentModel()
+
+def _label(value) -> Optional[int]:
+    if value in (1, True, "yes", "1", "spam"):
+        return 1
+    if value in (0, False, "no", "0", "ham"):
+        return 0
+    return None
+
+def read_labelled(path: str) -> Iterable[Tuple[str, int]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                label = _label(row.get("label"))
+                if row.get("text") and label is not None:
+                    yield row["text"], label
+
+async def mongo_examples() -> Dict[str, int]:
+    """
+    Labelled comments from past verdicts, strongest source last so it wins:
+    comments by users detected for spammy content (positive) and by nobody else
+    (negative), then comments logged as suspicious, then cached LLM verdicts.
+    """
+    examples: Dict[str, int] = {}
+    spammers = {
+        doc["username"]
+        async for doc in detected_collection.find({"reasons": SPAMMY_CONTENT_REASON}, {"username": 1})
+    }
+    async for comment in comments_collection.find({}, {"content": 1, "author_id": 1}):
+        if comment.get("content"):
+            examples[comment["content"]] = int(comment.get("author_id") in spammers)
+    suspicious_ids = [
+        log["comment_id"]
+        async for log in logs_collection.find({"type": EventType.SUSPICIOUS_COMMENT.value, "comment_id": {"$exists": True}}, {"comment_id": 1})
+    ]
+    for start in range(0, len(suspicious_ids), 1000):
+        ids = [ObjectId(comment_id) for comment_id in suspicious_ids[start:start + 1000] if ObjectId.is_valid(comment_id)]
+        async for comment in comments_collection.find({"_id": {"$in": ids}}, {"content": 1}):
+            if comment.get("content"):
+                examples[comment["content"]] = 1
+    async for verdict in verdicts_collection.find({"text": {"$exists": True}}, {"text": 1, "verdict": 1}):
+        label = _label(verdict["verdict"])
+        if label is not None:
+            examples[verdict["text"]] = label
+    return examples
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or try the local comment pre-classifier")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_parser = commands.add_parser("train", help="Retrain from past verdicts and labelled files")
+    train_parser.add_argument("--labelled", action="append", default=[], help="NDJSON file of {text, label}")
+    train_parser.add_argument("--no-mongo", action="store_true", help="Only use the labelled files")
+    train_parser.add_argument("--out", default=COMMENT_MODEL_PATH)
+    train_parser.add_argument("--epochs", type=int, default=5)
+    train_parser.add_argument("--low", type=float, default=DEFAULT_BAND[0])
+    train_parser.add_argument("--high", type=float, default=DEFAULT_BAND[1])
+    score_parser = commands.add_parser("score", help="Score comments with the saved model")
+    score_parser.add_argument("texts", nargs="+")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "score":
+        if not comment_model.load():
+            return
+        for text in args.texts:
+            started = time.perf_counter()
+            verdict, score = comment_model.verdict(text)
+            print(f"{score:.3f} {verdict or 'escalate'} ({(time.perf_counter() - started) * 1e6:.0f}us) {text}")
+        return
+
+    examples = {} if args.no_mongo else asyncio.run(mongo_examples())
+    for path in args.labelled:
+        examples.update(read_labelled(path))
+    if not examples:
+        print("No labelled comments found")
+        return
+    model = CommentModel(args.out)
+    model.band = (args.low, args.high)
+    metrics = model.fit(list(examples), list(examples.values()), epochs=args.epochs)
+    model.save()
+    print(json.dumps(metrics, indent=2))
+    print(f"Saved {args.out}; restart the API to load it")
+
+if __name__ == "__main__":
+    main()
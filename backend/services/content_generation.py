@@ -0,0 +1,98 @@
+# Bulk content generators for the honeytrap content pool: one completion yields a
+# batch of usernames, posts or comment templates. Malformed lines are dropped, so a
+# call may return fewer items than asked for.
+from services.llm import llm_gateway
+
+async def generate_realistic_usernames(purpose: str, count: int):
+    prompt = f"""
+    Generate {count} different realistic usernames based on the given purpose for social media accounts.
+    Purpose: {purpose}
+    Requirements:
+    - Each username must be realistic, concise, and align with the given purpose.
+    - Usernames should only consist of alphanumeric characters, underscores, or dots.
+    - Return **only** the usernames, one per line, without numbering or any additional text.
+    """
+
+    response = await llm_gateway.complete(
+        messages=[
+            {
+                "role": "system",
+                "content": "You are a username generator. Create realistic usernames that align with the given purpose, adhering strictly to the format."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    )
+
+    # Keep only well-formed, distinct lines
+    usernames = [line.strip() for line in response.split("\n")]
+    usernames = [name for name in usernames if 3 <= len(name) <= 30 and all(c.isalnum() or c in "_." for c in name)]
+    return list(dict.fromkeys(usernames))[:count]
+
+async def generate_enticing_posts(purpose: str, count: int):
+    prompt = f"""
+    Generate {count} different demo social media posts based on the given purpose.
+    Follow these instructions strictly:
+    - Each title must be concise, engaging, and no longer than 50 characters.
+    - Each content must be clear, focused, and relevant to the purpose.
+    - The response **must** follow this exact format for every post, without additional text or deviation:
+
+    TITLE: <brief engaging title>
+    CONTENT: <detailed post content>
+
+    Purpose: {purpose}
+    """
+
+    response = await llm_gateway.complete(
+        messages=[
+            {
+                "role": "system",
+                "content": "You are a professional social media content creator. Generate engaging posts that strictly follow the given format and align with the provided purpose."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    )
+
+    posts = []
+    title = None
+    for line in response.split("\n"):
+        line = line.strip()
+        if line.startswith("TITLE:"):
+            title = line.replace("TITLE:", "").strip()[:50]
+        elif line.startswith("CONTENT:") and title:
+            content = line.replace("CONTENT:", "").strip()
+            if len(title) >= 5 and len(content) >= 10:
+                posts.append((title, content))
+            title = None
+    return posts[:count]
+
+async def generate_comment_templates(count: int):
+    prompt = f"""
+    Generate {count} different realistic comments a person might leave on a social media post.
+    Requirements:
+    - Each comment must contain the placeholder {{title}} exactly once, where the post's title will be inserted.
+    - Comments should be concise, thoughtful, and read naturally once the title is filled in.
+    - Avoid generic responses like "Great post!" or "Nice!".
+    - Return **only** the comments, one per line, without numbering or any additional text.
+    """
+
+    response = await llm_gateway.complete(
+        messages=[
+            {
+                "role": "system",
+                "content": "You are a professional comment generator creating contextually relevant and meaningful comments for posts."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    )
+
+    templates = [line.strip() for line in response.split("\n")]
+    return [template for template in templates if template.count("{title}") == 1 and len(template) >= 15][:count]
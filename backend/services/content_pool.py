@@ -0,0 +1,181 @@
+import asyncio
+import datetime
+import logging
+import os
+from typing import Optional, Set, Tuple
+from pymongo.errors import PyMongoError
+from services.database import content_pool_collection, honeytraps_collection, users_collection
+from services.content_generation import generate_comment_templates, generate_enticing_posts, generate_realistic_usernames
+
+logger = logging.getLogger(__name__)
+
+# Pre-generated honeytrap content: usernames and posts per purpose, plus comment
+# templates (with a {title} placeholder) shared by every honeytrap. A background task
+# tops each stock back up to CONTENT_POOL_TARGET items whenever it falls below
+# CONTENT_POOL_LOW, generating CONTENT_POOL_BATCH items per LLM call, so creating a
+# honeytrap or an automated post or comment is a single find_one_and_delete.
+#
+# Usernames and posts are stocked for the purposes of honeytraps that exist, plus
+# CONTENT_POOL_PURPOSES: purposes new honeytraps are expected to be created with
+# before any honeytrap has them. The purposes are re-read on every refill, and stock
+# left for a purpose no longer among them is deleted.
+CONTENT_POOL_LOW = int(os.getenv("CONTENT_POOL_LOW", "5"))
+CONTENT_POOL_TARGET = int(os.getenv("CONTENT_POOL_TARGET", "20"))
+CONTENT_POOL_BATCH = int(os.getenv("CONTENT_POOL_BATCH", "10"))
+CONTENT_POOL_REFILL_SECONDS = float(os.getenv("CONTENT_POOL_REFILL_SECONDS", "60"))
+# Comma separated, e.g. "crypto scams,romance scams"; optional
+CONTENT_POOL_PURPOSES = [purpose for purpose in os.getenv("CONTENT_POOL_PURPOSES", "").split(",") if purpose.strip()]
+
+USERNAME = "username"
+POST = "post"
+COMMENT = "comment"
+
+def normalize_purpose(purpose: str) -> str:
+    return " ".join(purpose.lower().split())
+
+class ContentPool:
+    """
+    Mongo-backed stock of generated content, refilled in the background.
+
+    Items are popped atomically, so several API processes can share one pool. An
+    empty stock is not an error: callers fall back to generating on the spot, and
+    the pool is asked to refill.
+    """
+
+    def __init__(self, collection=content_pool_collection, low: int = CONTENT_POOL_LOW,
+                 target: int = CONTENT_POOL_TARGET, batch: int = CONTENT_POOL_BATCH,
+                 refill_seconds: float = CONTENT_POOL_REFILL_SECONDS):
+        self.collection = collection
+        self.low = low
+        self.target = target
+        self.batch = batch
+        self.refill_seconds = refill_seconds
+        self.configured: Set[str] = {normalize_purpose(purpose) for purpose in CONTENT_POOL_PURPOSES}
+        self.purposes: Set[str] = set(self.configured)
+        self._wake = asyncio.Event()
+        self._task = None
+        self.served = 0
+        self.misses = 0
+        self.generated = 0
+        self.refills = 0
+        self.errors = 0
+
+    async def _take(self, kind: str, purpose: Optional[str]) -> Optional[dict]:
+        try:
+            doc = await self.collection.find_one_and_delete(
+                {"kind": kind, "purpose": purpose}, sort=[("created_at", 1)]
+            )
+        except PyMongoError as e:
+            logger.error(f"Content pool read failed: {e}")
+            doc = None
+        if doc is None:
+            self.misses += 1
+        else:
+            self.served += 1
+        # Every take may have pushed the stock under the low watermark
+        self._wake.set()
+        return doc
+
+    async def take_username(self, purpose: str) -> Optional[str]:
+        purpose = normalize_purpose(purpose)
+        while True:
+            doc = await self._take(USERNAME, purpose)
+            if doc is None:
+                return None
+            # Generated in bulk ahead of time, so the name may have been taken since
+            if not await users_collection.find_one({"username": doc["username"]}, {"_id": 1}):
+                return doc["username"]
+
+    async def take_post(self, purpose: str) -> Optional[Tuple[str, str]]:
+        doc = await self._take(POST, normalize_purpose(purpose))
+        return (doc["title"], doc["content"]) if doc else None
+
+    async def take_comment(self, post_title: str) -> Optional[str]:
+        doc = await self._take(COMMENT, None)
+        return doc["template"].replace("{title}", post_title) if doc else None
+
+    async def _generate(self, kind: str, purpose: Optional[str]) -> list:
+        if kind == USERNAME:
+            return [{"username": username} for username in await generate_realistic_usernames(purpose, self.batch)]
+        if kind == POST:
+            return [{"title": title, "content": content} for title, content in await generate_enticing_posts(purpose, self.batch)]
+        return [{"template": template} for template in await generate_comment_templates(self.batch)]
+
+    async def refill(self) -> int:
+        """
+        Tops up every stock below the low watermark to the target.
+
+        Returns:
+            int: Number of items generated.
+        """
+        self.purposes = self.configured | {
+            normalize_purpose(purpose) for purpose in await honeytraps_collection.distinct("purpose") if purpose
+        }
+        await self.collection.delete_many({"kind": {"$in": [USERNAME, POST]}, "purpose": {"$nin": list(self.purposes)}})
+        stocks = [(kind, purpose) for purpose in self.purposes for kind in (USERNAME, POST)]
+        stocks.append((COMMENT, None))
+        counts = {
+            (group["_id"]["kind"], group["_id"]["purpose"]): group["count"]
+            async for group in self.collection.aggregate([
+                {"$group": {"_id": {"kind": "$kind", "purpose": "$purpose"}, "count": {"$sum": 1}}}
+            ])
+        }
+        generated = 0
+        for kind, purpose in stocks:
+            count = counts.get((kind, purpose), 0)
+            if count >= self.low:
+                continue
+            while count < self.target:
+                items = await self._generate(kind, purpose)
+                if not items:
+                    break
+                now = datetime.datetime.utcnow()
+                await self.collection.insert_many([{"kind": kind, "purpose": purpose, "created_at": now, **item} for item in items])
+                count += len(items)
+                generated += len(items)
+        if generated:
+            self.generated += generated
+            logger.info(f"Content pool refilled with {generated} items")
+        self.refills += 1
+        return generated
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                await self.refill()
+            except Exception as e:
+                # LLM and database failures alike: keep serving what is stocked
+                self.errors += 1
+                logger.error(f"Content pool refill failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.refill_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        lookups = self.served + self.misses
+        return {
+            "purposes": len(self.purposes),
+            "served": self.served,
+            "misses": self.misses,
+            "hit_rate": self.served / lookups if lookups else 0.0,
+            "generated": self.generated,
+            "refills": self.refills,
+            "errors": self.errors,
+        }
+
+content_pool = ContentPool()
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from services.cache import post_cache, post_tag
+from services.database import posts_collection
+
+logger = logging.getLogger(__name__)
+
+# When set, reads add not-yet-flushed deltas to the stored counters so a user sees
+# their own like/comment immediately.
+READ_YOUR_WRITES = os.getenv("COUNTERS_READ_YOUR_WRITES", "1") == "1"
+
+class CounterAggregator:
+    """
+    Write-behind buffer for hot counter updates.
+
+    Increments (and array pushes and field sets) for the same document are merged in
+    memory and written with one unordered bulk_write every `flush_interval_ms` or as
+    soon as `max_events` updates are pending, whichever comes first. Call `stop` on
+    shutdown: it lets a running flush finish and then flushes what is left.
+    `on_flush` is called with the keys of every acknowledged write, e.g. to
+    invalidate cached copies of those documents. A failed update is retried with
+    the next flushes, at most `max_retries` times.
+    """
+
+    def __init__(self, collection, flush_interval_ms: int = 250, max_events: int = 1000, upsert: bool = False,
+                 on_flush: Optional[Callable[[List], None]] = None, max_retries: int = 5):
+        self.collection = collection
+        self.upsert = upsert
+        self.on_flush = on_flush
+        self.max_retries = max_retries
+        self._attempts: Dict[Any, int] = {}
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_events = max_events
+        self._pending: Dict[Any, Dict[str, dict]] = {}
+        self._inflight: Dict[Any, Dict[str, dict]] = {}
+        self._events = 0
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = None
+        self.flushes = 0
+        self.flushed_events = 0
+        self.last_flush_ms = 0.0
+        self.dropped = 0
+
+    def _update(self, key) -> Dict[str, dict]:
+        return self._pending.setdefault(key, {"$inc": {}, "$push": {}, "$set": {}, "$setOnInsert": {}})
+
+    def incr(self, key, field: str, delta: int = 1):
+        incs = self._update(key)["$inc"]
+        incs[field] = incs.get(field, 0) + delta
+        self._record_event()
+
+    def push(self, key, field: str, value):
+        self._update(key)["$push"].setdefault(field, []).append(value)
+        self._record_event()
+
+    def set(self, key, field: str, value):
+        self._update(key)["$set"][field] = value
+        self._record_event()
+
+    def set_on_insert(self, key, fields: dict):
+        # Constant fields of an upserted document (e.g. what a bucket is for): written
+        # only when the upsert creates it, and not counted towards max_events, since
+        # they never need a flush of their own
+        on_insert = self._update(key)["$setOnInsert"]
+        if not on_insert:
+            on_insert.update(fields)
+
+    def _record_event(self):
+        self._events += 1
+        if self._events >= self.max_events:
+            self._wakeup.set()
+
+    def pending(self, key) -> Dict[str, int]:
+        deltas: Dict[str, int] = {}
+        for buffer in (self._inflight, self._pending):
+            for field, delta in buffer.get(key, {}).get("$inc", {}).items():
+                deltas[field] = deltas.get(field, 0) + delta
+        return deltas
+
+    def merge_into(self, doc: dict) -> dict:
+        if READ_YOUR_WRITES:
+            for field, delta in self.pending(doc["_id"]).items():
+                doc[field] = doc.get(field, 0) + delta
+        return doc
+
+    def _operation(self, key, update: Dict[str, dict]) -> UpdateOne:
+        body = {}
+        incs = {field: delta for field, delta in update["$inc"].items() if delta}
+        if incs:
+            body["$inc"] = incs
+        if update["$push"]:
+            body["$push"] = {field: {"$each": values} for field, values in update["$push"].items()}
+        if update["$set"]:
+            body["$set"] = update["$set"]
+        if self.upsert and update["$setOnInsert"]:
+            body["$setOnInsert"] = update["$setOnInsert"]
+        return UpdateOne({"_id": key}, body, upsert=self.upsert)
+
+    def _requeue(self, keys: List):
+        for key in keys:
+            update = self._inflight[key]
+            attempts = self._attempts.get(key, 0) + 1
+            if attempts > self.max_retries:
+                # Most likely a permanent error (e.g. the document fails validation)
+                logger.error(f"Counter update for {key} failed {attempts} times, dropping it: {update}")
+                self._attempts.pop(key, None)
+                self.dropped += 1
+                continue
+            self._attempts[key] = attempts
+            for field, delta in update["$inc"].items():
+                self.incr(key, field, delta)
+            for field, values in update["$push"].items():
+                for value in values:
+                    self.push(key, field, value)
+            for field, value in update["$set"].items():
+                # A newer set queued since the flush started wins
+                self._update(key)["$set"].setdefault(field, value)
+            self.set_on_insert(key, update["$setOnInsert"])
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            self._inflight, self._pending = self._pending, {}
+            events, self._events = self._events, 0
+            keys = [key for key, update in self._inflight.items() if any(update["$inc"].values()) or update["$push"] or update["$set"]]
+            start = time.perf_counter()
+            failed = []
+            try:
+                if keys:
+                    await self.collection.bulk_write(
+                        [self._operation(key, self._inflight[key]) for key in keys],
+                        ordered=False
+                    )
+                self.flushes += 1
+                self.flushed_events += events
+            except BulkWriteError as e:
+                failed = [keys[error["index"]] for error in e.details.get("writeErrors", [])]
+                logger.error(f"Counter flush: {len(failed)} of {len(keys)} updates failed, retrying them")
+                self._requeue(failed)
+            except PyMongoError as e:
+                failed = keys
+                logger.error(f"Counter flush failed, retrying {len(keys)} updates: {e}")
+                self._requeue(keys)
+            except asyncio.CancelledError:
+                # Cancelled mid-write from outside (e.g. the loop is torn down): the
+                # batch may or may not have landed, so keep it rather than lose it
+                self._requeue(keys)
+                raise
+            finally:
+                # Acknowledged or requeued: either way reads must stop adding these
+                # deltas, or they would be counted twice
+                self._inflight = {}
+                self.last_flush_ms = (time.perf_counter() - start) * 1000
+            failed = set(failed)
+            written = [key for key in keys if key not in failed]
+            for key in written:
+                self._attempts.pop(key, None)
+            if written and self.on_flush is not None:
+                self.on_flush(written)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._stopping:
+                await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Cooperative: a flush that is already writing is allowed to finish
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_documents": len(self._pending),
+            "pending_events": self._events,
+            "flushes": self.flushes,
+            "flushed_events": self.flushed_events,
+            "last_flush_ms": self.last_flush_ms,
+            "dropped_updates": self.dropped,
+        }
+
+def _invalidate_posts(post_ids: List):
+    # A body cached while the write was in flight may have counted its deltas twice
+    # (stored and in flight) or, without read-your-writes, not at all
+    post_cache.invalidate(*(post_tag(post_id) for post_id in post_ids))
+
+# likes_count / dislikes_count / comments_count (and the comments id list) on posts
+post_counters = CounterAggregator(posts_collection, on_flush=_invalidate_posts)
@@ -1,8 +1,11 @@
+import os
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
 from pymongo.collection import Collection
 
-MONGO_URI = "mongodb://localhost:27017/soney"
-DATABASE_NAME = "soney"
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/soney")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "soney")
 
 client = AsyncIOMotorClient(MONGO_URI)
 db = client[DATABASE_NAME]
@@ -17,3 +20,53 @@ honeytraps_collection = db["honeytraps"]
 logs_collection = db["logs"]
 detected_collection=db["detected"]
 analysis_collection=db["analysis"]
+feeds_collection = db["feeds"]
+hashtag_counters_collection = db["hashtag_counters"]
+analyser_state_collection = db["analyser_state"]
+analyser_users_collection = db["analyser_users"]
+stats_collection = db["stats"]
+rollups_collection = db["activity_rollups"]
+verdicts_collection = db["comment_verdicts"]
+content_pool_collection = db["content_pool"]
+
+async def ensure_indexes():
+    # Comment loading for a page of posts: a $lookup per post matching post_id, sorted by _id and limited
+    await comments_collection.create_index([("post_id", ASCENDING), ("_id", ASCENDING)])
+    # One like per user per post; a duplicate like fails on its insert
+    try:
+        await likes_collection.create_index([("post_id", ASCENDING), ("user_id", ASCENDING)], unique=True)
+    except DuplicateKeyError:
+        from services.likes import merge_duplicate_likes
+        await merge_duplicate_likes()
+        await likes_collection.create_index([("post_id", ASCENDING), ("user_id", ASCENDING)], unique=True)
+    # Keyset pagination: every list endpoint resumes from its cursor with one range scan
+    await posts_collection.create_index([("author_id", ASCENDING), ("_id", ASCENDING)])
+    await likes_collection.create_index([("post_id", ASCENDING), ("_id", ASCENDING)])
+    # Hashtag pages and trending counters
+    await posts_collection.create_index([("hashtags", ASCENDING), ("_id", ASCENDING)])
+    await hashtag_counters_collection.create_index([("granularity", ASCENDING), ("bucket", ASCENDING), ("tag", ASCENDING)], unique=True)
+    await hashtag_counters_collection.create_index("expires_at", expireAfterSeconds=0)
+    # Home feed: fan-out-on-read authors are looked up among a user's friends
+    await users_collection.create_index([("username", ASCENDING)])
+    await chats_collection.create_index([("sender_id", ASCENDING), ("receiver_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)])
+    # Interaction events: per actor, per honeytrap target and per type over time
+    await logs_collection.create_index([("actor", ASCENDING), ("ts", ASCENDING), ("_id", ASCENDING)])
+    await logs_collection.create_index([("target", ASCENDING), ("ts", ASCENDING), ("_id", ASCENDING)])
+    await logs_collection.create_index([("type", ASCENDING), ("ts", ASCENDING)])
+    # Activity time series; minute and hour buckets expire through the TTL index
+    await rollups_collection.create_index([("dimension", ASCENDING), ("key", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING)])
+    await rollups_collection.create_index("expires_at", expireAfterSeconds=0)
+    await verdicts_collection.create_index("expires_at", expireAfterSeconds=0)
+    # Dashboard statistics: top honeytrap and honeytrap posts by each counter
+    await stats_collection.create_index([("kind", ASCENDING), ("interactions", DESCENDING)])
+    await stats_collection.create_index([("kind", ASCENDING), ("likes", DESCENDING)])
+    await stats_collection.create_index([("kind", ASCENDING), ("comments", DESCENDING)])
+    # Pre-generated honeytrap content, popped oldest first per stock
+    await content_pool_collection.create_index([("kind", ASCENDING), ("purpose", ASCENDING), ("created_at", ASCENDING)])
+    # One detection record per user; detection upserts rely on it
+    try:
+        await detected_collection.create_index([("username", ASCENDING)], unique=True)
+    except DuplicateKeyError:
+        from services.detections import merge_duplicate_detections
+        await merge_duplicate_detections()
+        await detected_collection.create_index([("username", ASCENDING)], unique=True)
@@ -0,0 +1,84 @@
+import datetime
+import logging
+from typing import Dict, List
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from services.database import detected_collection
+from services.honeytrap_stats import honeytrap_stats
+
+DUPLICATE_KEY = 11000
+
+class DetectionSink:
+    """
+    Collects (username, reason) flags and commits them in one bulk_write.
+
+    Each flagged user becomes a single upsert that adds its reasons with $addToSet,
+    so committing is idempotent and two detectors flagging the same user at once
+    cannot create a second record (the unique index on detected.username backs this).
+    With `collection=None` flags are only kept in memory, e.g. for offline replays.
+    """
+
+    def __init__(self, collection=detected_collection):
+        self.collection = collection
+        self._flags: Dict[str, Dict[str, None]] = {}
+        self.detections: Dict[str, List[str]] = {}
+
+    def flag(self, username: str, reason: str):
+        self._flags.setdefault(username, {})[reason] = None
+
+    def __len__(self) -> int:
+        return len(self._flags)
+
+    def _operations(self, flags: dict, timestamp: str) -> list:
+        return [
+            UpdateOne(
+                {"username": username},
+                {
+                    "$addToSet": {"reasons": {"$each": list(reasons)}},
+                    "$setOnInsert": {"timestamp": timestamp}
+                },
+                upsert=True
+            )
+            for username, reasons in flags.items()
+        ]
+
+    async def commit(self):
+        flags, self._flags = self._flags, {}
+        if not flags:
+            return
+        for username, reasons in flags.items():
+            for reason in reasons:
+                logging.warning(f"{reason} detected for user: {username}")
+            known = self.detections.setdefault(username, [])
+            known.extend(reason for reason in reasons if reason not in known)
+        if self.collection is None:
+            return
+        operations = self._operations(flags, datetime.datetime.now().isoformat())
+        try:
+            result = await self.collection.bulk_write(operations, ordered=False)
+            honeytrap_stats.detected(result.upserted_count)
+        except BulkWriteError as e:
+            # Two upserts racing on a new username: the loser hits the unique index
+            # and is simply retried, now as an update of the winner's record.
+            retry = [operations[error["index"]] for error in e.details["writeErrors"] if error["code"] == DUPLICATE_KEY]
+            if len(retry) < len(e.details["writeErrors"]):
+                raise
+            await self.collection.bulk_write(retry, ordered=False)
+
+async def record_detection(username: str, reason: str):
+    sink = DetectionSink()
+    sink.flag(username, reason)
+    await sink.commit()
+
+async def merge_duplicate_detections():
+    # Folds records left over from the old find-then-insert path into one per user,
+    # so the unique index on username can be built.
+    pipeline = [
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$username", "ids": {"$push": "$_id"}, "reasons": {"$push": "$reasons"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]
+    async for group in detected_collection.aggregate(pipeline):
+        reasons = list(dict.fromkeys(reason for reasons in group["reasons"] for reason in reasons))
+        await detected_collection.update_one({"_id": group["ids"][0]}, {"$set": {"reasons": reasons}})
+        await detected_collection.delete_many({"_id": {"$in": group["ids"][1:]}})
@@ -0,0 +1,162 @@
+import bisect
+import datetime
+from typing import Dict, Iterable, List, Optional
+from services.spam_rules import spam_matcher
+
+# Pure detector logic shared by the scheduled analyser and offline tools. Nothing here
+# touches Mongo; per-user state is a plain dict so it can be persisted or shipped to
+# another process as-is.
+
+HIGH_FREQUENCY_REASON = "High-frequency interaction"
+SPAMMY_CONTENT_REASON = "Spammy content"
+TIME_PATTERN_REASON = "Time-based interaction pattern"
+
+# A user is flagged when interactions i and i + WINDOW_EVENTS are less than
+# WINDOW_SECONDS apart, i.e. more than 10 interactions inside one minute.
+WINDOW_SECONDS = 60
+WINDOW_EVENTS = 10
+WINDOW_US = WINDOW_SECONDS * 1_000_000
+SECOND_US = 1_000_000
+DAY_US = 86_400 * SECOND_US
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+def epoch_micros(ts: datetime.datetime) -> int:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    delta = ts - _EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+def is_spammy_comment(content: Optional[str]) -> bool:
+    return content is not None and spam_matcher.is_spam(content)
+
+def new_user_state() -> dict:
+    return {"last_id": None, "recent": [], "seconds": {}, "flags": []}
+
+def _window_hit(values: List[int], index: int) -> bool:
+    # Is there a run of WINDOW_EVENTS + 1 sorted values containing `index` that spans
+    # less than the window?
+    first = max(0, index - WINDOW_EVENTS)
+    last = min(index, len(values) - WINDOW_EVENTS - 1)
+    for start in range(first, last + 1):
+        if values[start + WINDOW_EVENTS] - values[start] < WINDOW_US:
+            return True
+    return False
+
+def check_high_frequency(state: dict, ts_us: int, content: Optional[str] = None) -> bool:
+    # `recent` keeps only the newest WINDOW_EVENTS timestamps, which is all this
+    # check needs for an in-order stream
+    recent = state["recent"]
+    index = bisect.bisect_right(recent, ts_us)
+    recent.insert(index, ts_us)
+    if _window_hit(recent, index):
+        recent.clear()
+        return True
+    del recent[:-WINDOW_EVENTS]
+    return False
+
+def _second_counts(state: dict) -> Dict[str, int]:
+    seconds = state.get("seconds")
+    if seconds is None:
+        # State persisted before the per-second counts kept every time-of-day
+        seconds = state["seconds"] = {}
+        for time_of_day in state.pop("times", []):
+            key = str(time_of_day // SECOND_US)
+            seconds[key] = seconds.get(key, 0) + 1
+    return seconds
+
+def check_time_pattern(state: dict, ts_us: int, content: Optional[str] = None) -> bool:
+    # This check compares interactions across days, so it cannot forget old ones.
+    # `seconds` counts them per second of the day instead of keeping each one: at
+    # most 86,400 entries, stored sparsely with string keys so the state stays a
+    # Mongo document. A run of WINDOW_SECONDS whole seconds spans less than the
+    # window, so the check flags when one holds more than WINDOW_EVENTS interactions.
+    seconds = _second_counts(state)
+    second = ts_us % DAY_US // SECOND_US
+    key = str(second)
+    seconds[key] = seconds.get(key, 0) + 1
+    counts = [seconds.get(str(s), 0) for s in range(second - WINDOW_SECONDS + 1, second + WINDOW_SECONDS)]
+    running = sum(counts[:WINDOW_SECONDS])
+    for start in range(WINDOW_SECONDS):
+        if start:
+            running += counts[start + WINDOW_SECONDS - 1] - counts[start - 1]
+        if running > WINDOW_EVENTS:
+            seconds.clear()
+            return True
+    return False
+
+def check_spammy_content(state: dict, ts_us: int, content: Optional[str] = None) -> bool:
+    return is_spammy_comment(content)
+
+# reason: check, in the order they run. Each check is skipped once the user is
+# flagged for its reason.
+DETECTORS = {
+    HIGH_FREQUENCY_REASON: check_high_frequency,
+    TIME_PATTERN_REASON: check_time_pattern,
+    SPAMMY_CONTENT_REASON: check_spammy_content,
+}
+
+def update_user_state(state: dict, ts_us: int, content: Optional[str] = None) -> List[str]:
+    """
+    Feeds one interaction into a user's detector state.
+
+    Args:
+        state (dict): The user's state from `new_user_state`, updated in place.
+        ts_us (int): Interaction time in epoch microseconds.
+        content (str): Comment text, for comments on honeytrap posts.
+
+    Returns:
+        list: Reasons this interaction newly flagged the user for.
+    """
+    flags = state["flags"]
+    flagged = [reason for reason, check in DETECTORS.items() if reason not in flags and check(state, ts_us, content)]
+    flags.extend(flagged)
+    return flagged
+
+def analyse_events(logs: Iterable[dict], states: dict, sink):
+    """
+    Runs the incremental detectors over logs in _id order.
+
+    Args:
+        logs (iterable): Log documents with _id, actor, ts and optional content.
+        states (dict): Per-user state by username, created as needed and updated in place.
+        sink: Receives flags through `flag(username, reason)`, e.g. a DetectionSink.
+    """
+    for log in logs:
+        state = states.setdefault(log["actor"], {"_id": log["actor"], **new_user_state()})
+        # Replaying a batch after a crash must not count the same log twice
+        if state["last_id"] is not None and log["_id"] <= state["last_id"]:
+            continue
+        state["last_id"] = log["_id"]
+        for reason in update_user_state(state, epoch_micros(log["ts"]), log.get("content")):
+            sink.flag(log["actor"], reason)
+
+# Reference batch versions of the window detectors, written exactly like the original
+# per-run loops. They are the baseline the vectorized engine must agree with.
+
+def find_high_frequency_users(events) -> set:
+    interaction_counts = {}
+    for username, timestamp in events:
+        interaction_counts.setdefault(username, []).append(timestamp)
+    suspicious_users = set()
+    for username, timestamps in interaction_counts.items():
+        timestamps.sort()
+        for i in range(len(timestamps) - WINDOW_EVENTS):
+            if (timestamps[i + WINDOW_EVENTS] - timestamps[i]).total_seconds() < WINDOW_SECONDS:
+                suspicious_users.add(username)
+                break
+    return suspicious_users
+
+def find_time_pattern_users(events) -> set:
+    interaction_times = {}
+    for username, timestamp in events:
+        interaction_times.setdefault(username, []).append(timestamp.time())
+    suspicious_users = set()
+    today = datetime.date.today()
+    for username, times in interaction_times.items():
+        times.sort()
+        for i in range(len(times) - WINDOW_EVENTS):
+            if (datetime.datetime.combine(today, times[i + WINDOW_EVENTS]) - datetime.datetime.combine(today, times[i])).total_seconds() < WINDOW_SECONDS:
+                suspicious_users.add(username)
+                break
+    return suspicious_users
@@ -0,0 +1,72 @@
+from typing import Dict, List, Sequence, Set
+import numpy as np
+from services.detectors import DAY_US, WINDOW_EVENTS, WINDOW_US
+
+# Vectorized window detectors over the full log history. Events are held as parallel
+# int64 arrays (user code, epoch microseconds); one sort groups every user's
+# timestamps in order, and a shifted difference compares each event with the one
+# WINDOW_EVENTS later for all users at once.
+
+class EventArrays:
+    """Column store of (username, timestamp) pairs built up batch by batch."""
+
+    def __init__(self):
+        self.codes_by_name: Dict[str, int] = {}
+        self.names: List[str] = []
+        self._codes: List[np.ndarray] = []
+        self._times: List[np.ndarray] = []
+
+    def extend(self, usernames: Sequence[str], timestamps: Sequence):
+        """
+        Appends a batch of events.
+
+        Args:
+            usernames (list): Actor of each event.
+            timestamps (list): ISO strings or datetimes; parsed by NumPy in one call.
+        """
+        codes_by_name = self.codes_by_name
+        codes = np.fromiter(
+            (codes_by_name.setdefault(name, len(codes_by_name)) for name in usernames),
+            dtype=np.int64, count=len(usernames)
+        )
+        if len(codes_by_name) > len(self.names):
+            self.names.extend(list(codes_by_name)[len(self.names):])
+        self._codes.append(codes)
+        self._times.append(np.array(timestamps, dtype="datetime64[us]").astype(np.int64))
+
+    @property
+    def codes(self) -> np.ndarray:
+        return np.concatenate(self._codes) if self._codes else np.empty(0, dtype=np.int64)
+
+    @property
+    def times(self) -> np.ndarray:
+        return np.concatenate(self._times) if self._times else np.empty(0, dtype=np.int64)
+
+def _sorted_by_user(codes: np.ndarray, values: np.ndarray):
+    # When (code, value - min) fits in 63 bits, pack both into one key and do a single
+    # flat sort, several times faster than lexsort; otherwise fall back to lexsort.
+    offsets = values - values.min()
+    value_bits = int(offsets.max()).bit_length()
+    if value_bits + int(codes.max()).bit_length() < 63:
+        keys = np.sort((codes << value_bits) | offsets)
+        return keys >> value_bits, keys & ((1 << value_bits) - 1)
+    order = np.lexsort((values, codes))
+    return codes[order], values[order]
+
+def window_hits(codes: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Returns the codes of users with WINDOW_EVENTS + 1 events (by `values`) spanning
+    less than WINDOW_US.
+    """
+    if len(codes) <= WINDOW_EVENTS:
+        return np.empty(0, dtype=np.int64)
+    codes, values = _sorted_by_user(codes, values)
+    same_user = codes[WINDOW_EVENTS:] == codes[:-WINDOW_EVENTS]
+    in_window = (values[WINDOW_EVENTS:] - values[:-WINDOW_EVENTS]) < WINDOW_US
+    return np.unique(codes[WINDOW_EVENTS:][same_user & in_window])
+
+def find_high_frequency_users(events: EventArrays) -> Set[str]:
+    return {events.names[code] for code in window_hits(events.codes, events.times)}
+
+def find_time_pattern_users(events: EventArrays) -> Set[str]:
+    return {events.names[code] for code in window_hits(events.codes, events.times % DAY_US)}
@@ -0,0 +1,65 @@
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from services.database import feeds_collection, posts_collection, users_collection
+
+# Each user's home feed is one document keyed by username holding the newest post ids
+# first, capped at FEED_MAX_ENTRIES by $slice on every push.
+FEED_MAX_ENTRIES = 500
+# Authors with more friends than this are not fanned out on write; their posts are
+# pulled into their friends' feeds at read time instead.
+FANOUT_MAX_FRIENDS = 500
+
+async def fan_out_post(post_id: ObjectId, author: str, friends: List[str]):
+    if len(friends) > FANOUT_MAX_FRIENDS:
+        await users_collection.update_one({"username": author}, {"$set": {"fanout_on_read": True}})
+        owners = [author]
+    else:
+        owners = [author, *friends]
+    await feeds_collection.bulk_write([
+        UpdateOne(
+            {"_id": owner},
+            {"$push": {"post_ids": {"$each": [post_id], "$position": 0, "$slice": FEED_MAX_ENTRIES}}},
+            upsert=True
+        )
+        for owner in dict.fromkeys(owners)
+    ], ordered=False)
+
+async def read_feed(username: str, friends: List[str], limit: int, after: Optional[ObjectId] = None) -> Tuple[List[dict], bool]:
+    """
+    Reads one page of a user's home feed, newest first.
+
+    Pushed entries come from a single point read of the user's feed document; posts by
+    friends that are served fan-out-on-read are merged in with one ranged query on
+    (author_id, _id).
+
+    Returns:
+        tuple: (posts, has_more)
+    """
+    feed = await feeds_collection.find_one({"_id": username})
+    pushed = feed["post_ids"] if feed else []
+    if after is not None:
+        pushed = [post_id for post_id in pushed if post_id < after]
+
+    pulled = []
+    if friends:
+        heavy = await users_collection.find(
+            {"username": {"$in": friends}, "fanout_on_read": True},
+            {"username": 1}
+        ).to_list(None)
+        if heavy:
+            query = {"author_id": {"$in": [user["username"] for user in heavy]}}
+            if after is not None:
+                query["_id"] = {"$lt": after}
+            pulled = await posts_collection.find(query).sort("_id", -1).limit(limit + 1).to_list(limit + 1)
+
+    pulled_by_id = {post["_id"]: post for post in pulled}
+    ids = sorted(set(pushed[:limit + 1]) | set(pulled_by_id), reverse=True)
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+
+    missing = [post_id for post_id in ids if post_id not in pulled_by_id]
+    if missing:
+        async for post in posts_collection.find({"_id": {"$in": missing}}):
+            pulled_by_id[post["_id"]] = post
+    return [pulled_by_id[post_id] for post_id in ids if post_id in pulled_by_id], has_more
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from typing import FrozenSet
+from pymongo.errors import PyMongoError
+from services.database import honeytraps_collection
+
+logger = logging.getLogger(__name__)
+
+class HoneytrapRoster:
+    """
+    In-memory set of honeytrap usernames, so "is this a honeytrap?" is an O(1) set
+    lookup instead of a Mongo round trip on every interaction. Loaded at startup,
+    updated when a honeytrap is created here, and resynced every `resync_seconds`
+    to pick up honeytraps created by other processes.
+    """
+
+    def __init__(self, resync_seconds: float = 60.0):
+        self.resync_seconds = resync_seconds
+        self._usernames: FrozenSet[str] = frozenset()
+        self._task = None
+
+    def __contains__(self, username) -> bool:
+        return username in self._usernames
+
+    def __len__(self) -> int:
+        return len(self._usernames)
+
+    @property
+    def usernames(self) -> FrozenSet[str]:
+        return self._usernames
+
+    def add(self, username: str):
+        # Swap in a new frozenset so readers iterating the old one are unaffected
+        self._usernames = self._usernames | {username}
+
+    async def load(self):
+        self._usernames = frozenset([
+            honeytrap["username"] async for honeytrap in honeytraps_collection.find({}, {"username": 1})
+        ])
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.resync_seconds)
+            try:
+                await self.load()
+            except PyMongoError as e:
+                logger.error(f"Honeytrap roster resync failed: {e}")
+
+    async def start(self):
+        await self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+honeytrap_roster = HoneytrapRoster()
@@ -0,0 +1,276 @@
+import asyncio
+import datetime
+import logging
+import os
+from typing import Dict, Optional
+from pymongo import DESCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from models.event import EventType
+from services.counters import CounterAggregator
+from services.database import detected_collection, honeytraps_collection, stats_collection
+from services.honeytrap_roster import honeytrap_roster
+from services.log_writer import log_writer
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ID = "honeytraps"
+HONEYTRAP = "honeytrap"
+POST = "post"
+# Counts of honeytrap events whose logs were archived and deleted by retention
+ARCHIVED = "archived"
+ARCHIVED_BATCHES_KEPT = 100
+RECONCILE_SECONDS = float(os.getenv("STATS_RECONCILE_SECONDS", "300"))
+RECONCILE_BATCH_SIZE = 1000
+DUPLICATE_KEY = 11000
+
+def _row_id(kind: str, key) -> str:
+    return f"{kind}|{key}"
+
+# Per-honeytrap event counts through an indexed lookup on logs (actor, ts)
+HONEYTRAPS_PIPELINE = [
+    {"$project": {"username": 1}},
+    {"$lookup": {
+        "from": "logs", "localField": "username", "foreignField": "actor",
+        "pipeline": [{"$group": {
+            "_id": None,
+            "interactions": {"$sum": 1},
+            "friend_requests": {"$sum": {"$cond": [{"$eq": ["$type", EventType.FRIEND_REQUEST_SENT.value]}, 1, 0]}}
+        }}],
+        "as": "events"
+    }},
+    {"$project": {
+        "_id": 0,
+        "username": 1,
+        "interactions": {"$sum": "$events.interactions"},
+        "friend_requests": {"$sum": "$events.friend_requests"}
+    }}
+]
+
+# Every honeytrap post through an indexed lookup on posts (author_id, _id); the
+# $unwind right after the $lookup is coalesced into it, so posts are streamed one by
+# one instead of being collected into an array per honeytrap
+POSTS_PIPELINE = [
+    {"$project": {"username": 1}},
+    {"$lookup": {
+        "from": "posts", "localField": "username", "foreignField": "author_id",
+        "pipeline": [{"$project": {"title": 1, "likes_count": 1, "comments_count": 1}}],
+        "as": "posts"
+    }},
+    {"$unwind": "$posts"},
+    {"$replaceRoot": {"newRoot": "$posts"}}
+]
+
+class HoneytrapStats:
+    """
+    Materialized dashboard statistics.
+
+    Totals live in one snapshot document; each honeytrap and each honeytrap post
+    has a row document of its own, so nothing grows with the number of posts.
+    Logged events, new honeytraps, honeytrap posts and new detections bump these
+    through a write-behind CounterAggregator, so reading the statistics is a
+    find_one plus three indexed top-1 queries. Every `reconcile_seconds` everything
+    is recomputed from scratch to correct any drift (e.g. writes made by other
+    processes or lost in a crash).
+    """
+
+    def __init__(self, collection=stats_collection, reconcile_seconds: float = RECONCILE_SECONDS):
+        self.collection = collection
+        self.reconcile_seconds = reconcile_seconds
+        self.counters = CounterAggregator(collection, upsert=True)
+        self._task = None
+        self.reconciles = 0
+
+    def _incr(self, field: str, delta: int = 1):
+        self.counters.incr(SNAPSHOT_ID, field, delta)
+
+    def _row(self, kind: str, key: str) -> str:
+        row_id = _row_id(kind, key)
+        self.counters.set_on_insert(row_id, {"kind": kind, "username" if kind == HONEYTRAP else "post_id": key})
+        return row_id
+
+    def _incr_row(self, kind: str, key: str, field: str, delta: int = 1):
+        self.counters.incr(self._row(kind, key), field, delta)
+
+    def observe(self, event: dict):
+        actor, target, post_id = event["actor"], event.get("target"), event.get("post_id")
+        if actor in honeytrap_roster:
+            self._incr("interactions")
+            self._incr_row(HONEYTRAP, actor, "interactions")
+            if event["type"] == EventType.FRIEND_REQUEST_SENT.value:
+                self._incr("friend_requests")
+        if post_id and target in honeytrap_roster:
+            if event["type"] in (EventType.POST_LIKED.value, EventType.POST_UNLIKED.value):
+                delta = 1 if event["type"] == EventType.POST_LIKED.value else -1
+                self._incr("likes", delta)
+                self._incr_row(POST, post_id, "likes", delta)
+            elif event["type"] == EventType.COMMENTED.value:
+                self._incr("comments")
+                self._incr_row(POST, post_id, "comments")
+
+    def honeytrap_created(self):
+        self._incr("honeytraps")
+
+    def post_created(self, post_id, title: str):
+        self._incr("posts")
+        self.counters.set(self._row(POST, str(post_id)), "title", title)
+
+    def detected(self, count: int):
+        if count:
+            self._incr("detected", count)
+
+    async def _replace_rows(self, rows: list):
+        if rows:
+            await self.collection.bulk_write(
+                [ReplaceOne({"_id": row["_id"]}, row, upsert=True) for row in rows], ordered=False
+            )
+
+    async def recompute(self) -> dict:
+        # Queued log entries were already counted when they were logged: write them
+        # before aggregating the logs, and write pending increments before replacing
+        # the documents, so neither is dropped nor applied twice
+        await log_writer.drain()
+        await self.counters.flush()
+        reconciled_at = datetime.datetime.utcnow()
+        snapshot = {
+            "_id": SNAPSHOT_ID, "honeytraps": 0, "interactions": 0, "friend_requests": 0,
+            "posts": 0, "likes": 0, "comments": 0,
+        }
+        archived = {
+            row["username"]: row
+            async for row in self.collection.find({"kind": ARCHIVED}, {"username": 1, "interactions": 1, "friend_requests": 1})
+        }
+        rows = []
+        async for row in honeytraps_collection.aggregate(HONEYTRAPS_PIPELINE):
+            baseline = archived.get(row["username"], {})
+            interactions = row["interactions"] + baseline.get("interactions", 0)
+            snapshot["honeytraps"] += 1
+            snapshot["interactions"] += interactions
+            snapshot["friend_requests"] += row["friend_requests"] + baseline.get("friend_requests", 0)
+            rows.append({
+                "_id": _row_id(HONEYTRAP, row["username"]), "kind": HONEYTRAP, "username": row["username"],
+                "interactions": interactions, "reconciled_at": reconciled_at
+            })
+            if len(rows) >= RECONCILE_BATCH_SIZE:
+                await self._replace_rows(rows)
+                rows = []
+        async for post in honeytraps_collection.aggregate(POSTS_PIPELINE):
+            likes, comments = post.get("likes_count", 0), post.get("comments_count", 0)
+            snapshot["posts"] += 1
+            snapshot["likes"] += likes
+            snapshot["comments"] += comments
+            rows.append({
+                "_id": _row_id(POST, post["_id"]), "kind": POST, "post_id": str(post["_id"]),
+                "title": post.get("title"), "likes": likes, "comments": comments, "reconciled_at": reconciled_at
+            })
+            if len(rows) >= RECONCILE_BATCH_SIZE:
+                await self._replace_rows(rows)
+                rows = []
+        await self._replace_rows(rows)
+        # Rows of deleted honeytraps and posts, including ones only ever written by counters
+        await self.collection.delete_many({"kind": {"$in": [HONEYTRAP, POST]}, "reconciled_at": {"$not": {"$gte": reconciled_at}}})
+        snapshot["detected"] = await detected_collection.count_documents({})
+        snapshot["reconciled_at"] = reconciled_at
+        await self.collection.replace_one({"_id": SNAPSHOT_ID}, snapshot, upsert=True)
+        self.reconciles += 1
+        return snapshot
+
+    async def fold_archived(self, batch_id: str, counts: Dict[str, Dict[str, int]]):
+        """
+        Adds the counts of an archived batch of logs to the baseline that `recompute`
+        adds back, so archiving does not lower the totals.
+
+        Folding is idempotent per batch: each baseline row remembers the last
+        ARCHIVED_BATCHES_KEPT batches, so a batch archived again after a crash
+        between folding and deleting it is not counted twice.
+
+        Args:
+            batch_id (str): Identifies the batch, e.g. its first log _id.
+            counts (dict): {"interactions", "friend_requests"} per honeytrap username.
+        """
+        operations = [
+            UpdateOne(
+                {"_id": _row_id(ARCHIVED, username), "batches": {"$ne": batch_id}},
+                {
+                    "$inc": fields,
+                    "$setOnInsert": {"kind": ARCHIVED, "username": username},
+                    "$push": {"batches": {"$each": [batch_id], "$slice": -ARCHIVED_BATCHES_KEPT}}
+                },
+                upsert=True
+            )
+            for username, fields in counts.items()
+        ]
+        if not operations:
+            return
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # An already folded batch no longer matches its row, so the upsert collides
+            # with the existing _id: nothing to add
+            if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+                raise
+
+    async def snapshot(self, fresh: bool = False) -> dict:
+        if not fresh:
+            snapshot = await self.collection.find_one({"_id": SNAPSHOT_ID})
+            if snapshot is not None:
+                return snapshot
+        return await self.recompute()
+
+    async def _top(self, kind: str, field: str) -> Optional[dict]:
+        query = {"kind": kind}
+        if kind == POST:
+            # Rows created by a like or comment before the post's own title was written
+            query["title"] = {"$ne": None}
+        return await self.collection.find_one(query, sort=[(field, DESCENDING)])
+
+    async def statistics(self, fresh: bool = False) -> list:
+        """
+        Builds the dashboard statistics from the snapshot.
+
+        Args:
+            fresh (bool): Recompute from the source collections instead of reading
+                the materialized snapshot.
+
+        Returns:
+            list: {"name", "value"} pairs, in the order the dashboard shows them.
+        """
+        snapshot = await self.snapshot(fresh)
+        most_active = await self._top(HONEYTRAP, "interactions")
+        most_liked = await self._top(POST, "likes")
+        most_commented = await self._top(POST, "comments")
+        return [
+            {"name": "Total Honeytraps", "value": snapshot.get("honeytraps", 0)},
+            {"name": "Total Interactions", "value": snapshot.get("interactions", 0)},
+            {"name": "Total Posts by Honeytraps", "value": snapshot.get("posts", 0)},
+            {"name": "Total Likes on Honeytrap Posts", "value": snapshot.get("likes", 0)},
+            {"name": "Total Comments on Honeytrap Posts", "value": snapshot.get("comments", 0)},
+            {"name": "Total Friend Requests Sent by Honeytraps", "value": snapshot.get("friend_requests", 0)},
+            {"name": "Total Detected Users", "value": snapshot.get("detected", 0)},
+            {"name": "Most Active Honeytrap", "value": most_active["username"] if most_active else "N/A"},
+            {"name": "Most Liked Honeytrap Post", "value": most_liked["title"] if most_liked else "N/A"},
+            {"name": "Most Commented Honeytrap Post", "value": most_commented["title"] if most_commented else "N/A"},
+        ]
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reconcile_seconds)
+            try:
+                await self.recompute()
+            except PyMongoError as e:
+                logger.error(f"Statistics reconcile failed: {e}")
+
+    def start(self):
+        self.counters.start()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.counters.stop()
+
+    def stats(self) -> dict:
+        return {**self.counters.stats(), "reconciles": self.reconciles}
+
+honeytrap_stats = HoneytrapStats()
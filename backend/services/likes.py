@@ -0,0 +1,92 @@
+import datetime
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pymongo.errors import DuplicateKeyError
+from services.cache import post_cache, post_tag
+from services.counters import post_counters
+from services.database import likes_collection, posts_collection
+from services.honeytrap_roster import honeytrap_roster
+from models.event import EventType
+from routers.log import log_action
+
+# Fields needed when a like changes a post's counter: enough to tell whether the
+# author is a honeytrap and to describe the post in the interaction log.
+POST_PROJECTION = {"author_id": 1, "title": 1, "honeytrap": 1}
+
+def is_honeytrap_post(post: dict) -> bool:
+    return post.get("honeytrap", False) or post["author_id"] in honeytrap_roster
+
+async def _find_post(post_id: str):
+    return await posts_collection.find_one({"_id": ObjectId(post_id)}, POST_PROJECTION)
+
+def _apply_like_delta(post: dict, delta: int):
+    post_counters.incr(post["_id"], "likes_count", delta)
+    post_cache.invalidate(post_tag(post["_id"]))
+
+async def add_like(post_id: str, username: str) -> dict:
+    """
+    Records a like and bumps the post's counter. The unique (post_id, user_id) index
+    makes a repeated like fail on its single insert, so concurrent duplicates can
+    never double-count. The counter change itself is write-behind.
+
+    Returns:
+        dict: The inserted like document.
+    """
+    post = await _find_post(post_id)
+    if not post:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+    like = {
+        "post_id": post_id,
+        "user_id": username,
+        "created_at": datetime.datetime.now().isoformat()
+    }
+    try:
+        await likes_collection.insert_one(like)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You have already liked this post")
+
+    _apply_like_delta(post, 1)
+    if is_honeytrap_post(post):
+        await log_action(username, EventType.POST_LIKED, f"Liked honeytrap post: {post['title']}", target=post["author_id"], post_id=post_id)
+    return like
+
+async def remove_like(query: dict, username: str) -> dict:
+    """
+    Deletes the like matching `query` (which must pin user_id to `username`) and
+    decrements the post's counter only if this call removed it.
+
+    Returns:
+        dict: The deleted like document.
+    """
+    like = await likes_collection.find_one_and_delete(query)
+    if not like:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Like not found")
+
+    post = await _find_post(like["post_id"])
+    if post:
+        _apply_like_delta(post, -1)
+        if is_honeytrap_post(post):
+            await log_action(username, EventType.POST_UNLIKED, f"Removed like from honeytrap post: {post['title']}", target=post["author_id"], post_id=like["post_id"])
+    return like
+
+async def merge_duplicate_likes():
+    # Deletes the repeated likes left over from the old check-then-insert path,
+    # keeping each user's first like of a post, so the unique (post_id, user_id)
+    # index can be built. Each deleted duplicate had bumped likes_count once, so the
+    # affected posts are decremented by what was deleted; likes_count is not
+    # recounted, as older posts were liked without like documents.
+    pipeline = [
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": {"post_id": "$post_id", "user_id": "$user_id"}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]
+    removed = {}
+    async for group in likes_collection.aggregate(pipeline, allowDiskUse=True):
+        result = await likes_collection.delete_many({"_id": {"$in": group["ids"][1:]}})
+        post_id = group["_id"]["post_id"]
+        removed[post_id] = removed.get(post_id, 0) + result.deleted_count
+    for post_id, count in removed.items():
+        if not ObjectId.is_valid(post_id) or not count:
+            continue
+        await posts_collection.update_one({"_id": ObjectId(post_id)}, {"$inc": {"likes_count": -count}})
+        post_cache.invalidate(post_tag(post_id))
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+import time
+from typing import List, Optional
+from dotenv import load_dotenv
+from groq import AsyncGroq
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GROOQ_API_KEY = os.getenv("GROOQ_API_KEY")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3-8b-8192")
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+
+class LLMTimeoutError(TimeoutError):
+    pass
+
+class LLMGateway:
+    """
+    The one way the backend talks to the LLM.
+
+    Completions are awaited on a single AsyncGroq client, so its HTTP connection
+    pool is reused across calls and a slow completion only suspends its own
+    caller. At most `concurrency` calls are in flight; the rest queue on a
+    semaphore. Each call, queueing included, is cut off after `timeout` seconds.
+    """
+
+    def __init__(self, api_key: Optional[str] = GROOQ_API_KEY, model: str = LLM_MODEL,
+                 concurrency: int = LLM_CONCURRENCY, timeout: float = LLM_TIMEOUT_SECONDS,
+                 max_retries: int = LLM_MAX_RETRIES):
+        self.api_key = api_key
+        self.model = model
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._client: Optional[AsyncGroq] = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.calls = 0
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.seconds = 0.0
+
+    @property
+    def client(self) -> AsyncGroq:
+        # Created on first use, so importing the routers does not need an API key
+        if self._client is None:
+            self._client = AsyncGroq(api_key=self.api_key, timeout=self.timeout, max_retries=self.max_retries)
+        return self._client
+
+    async def _complete(self, messages: List[dict], model: str) -> str:
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            chat_completion = await self.client.chat.completions.create(messages=messages, model=model)
+            return chat_completion.choices[0].message.content.strip()
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.requests += 1
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def complete(self, messages: List[dict], model: Optional[str] = None, timeout: Optional[float] = None) -> str:
+        """
+        Runs one chat completion.
+
+        Args:
+            messages (list): Chat messages, {"role", "content"} each.
+            model (str): Model name; defaults to LLM_MODEL.
+            timeout (float): Seconds to wait, including queueing; defaults to LLM_TIMEOUT_SECONDS.
+
+        Returns:
+            str: The stripped content of the first choice.
+
+        Raises:
+            LLMTimeoutError: If no completion arrived in time.
+        """
+        timeout = timeout or self.timeout
+        self.calls += 1
+        try:
+            return await asyncio.wait_for(self._complete(messages, model or self.model), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning(f"LLM call timed out after {timeout}s")
+            raise LLMTimeoutError(f"LLM call timed out after {timeout}s")
+        except Exception:
+            self.errors += 1
+            raise
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "concurrency": self.concurrency,
+            "avg_request_seconds": round(self.seconds / max(1, self.requests), 3),
+        }
+
+llm_gateway = LLMGateway()
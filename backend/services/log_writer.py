@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import os
+import time
+from pymongo.errors import BulkWriteError, PyMongoError
+from services.database import logs_collection
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+DUPLICATE_KEY = 11000
+
+class LogWriter:
+    """
+    Buffered writer for interaction logs.
+
+    `submit` puts an entry on a bounded queue and returns; a background task drains
+    it with insert_many once `batch_size` entries are waiting or `flush_interval_ms`
+    has passed since the first one. When the queue is full, "block" makes the caller
+    wait for room and "drop" discards the entry and counts it. `stop` writes
+    everything still queued, and `drain` waits for everything queued so far.
+
+    A batch that fails on a transient database error is retried with exponential
+    backoff, up to `max_retries` times; entries rejected by the server are counted
+    as failed. If the task dies anyway it is logged and restarted, so "block"
+    callers never wait on a queue nobody drains.
+    """
+
+    def __init__(self, collection, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval_ms: int = 200, overflow: str = "block",
+                 max_retries: int = 5, retry_backoff_ms: int = 500):
+        if overflow not in ("block", "drop"):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.overflow = overflow
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff_ms / 1000
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+        self._done = asyncio.Condition()
+        # The batch being collected or written, for a restarted task to account for
+        self._batch: list = []
+        self.enqueued = 0
+        self.completed = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self.restarts = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    async def submit(self, entry: dict) -> bool:
+        if self._task is None:
+            # Not running (scripts, tests): write through
+            await self.collection.insert_one(entry)
+            self.written += 1
+            return True
+        if self.overflow == "drop":
+            try:
+                self._queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                return False
+        else:
+            await self._queue.put(entry)
+        self.enqueued += 1
+        return True
+
+    async def _insert(self, batch: list) -> list:
+        """
+        Inserts `batch` once.
+
+        Returns:
+            list: The entries to retry; empty when the batch is done.
+        """
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+            self.written += len(batch)
+            return []
+        except BulkWriteError as e:
+            # insert_many gave every entry its _id, so entries that made it in on an
+            # earlier attempt come back as duplicates: those are written too
+            rejected = [error for error in e.details.get("writeErrors", []) if error["code"] != DUPLICATE_KEY]
+            self.written += len(batch) - len(rejected)
+            if rejected:
+                self.failed += len(rejected)
+                logger.error(f"Log flush: {len(rejected)} of {len(batch)} entries rejected: {rejected[0].get('errmsg')}")
+            return []
+        except PyMongoError as e:
+            logger.warning(f"Log flush of {len(batch)} entries failed: {e}")
+            return batch
+        except Exception:
+            # Not a database error (e.g. an entry BSON cannot encode): retrying won't help
+            self.failed += len(batch)
+            logger.exception(f"Log flush of {len(batch)} entries failed")
+            return []
+
+    async def _write(self, batch: list):
+        start = time.perf_counter()
+        count = len(batch)
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                await asyncio.sleep(min(self.retry_backoff * 2 ** (attempt - 1), 30))
+            batch = await self._insert(batch)
+            if not batch:
+                break
+        else:
+            self.failed += len(batch)
+            logger.error(f"Log flush gave up on {len(batch)} entries after {self.max_retries} retries")
+        elapsed = (time.perf_counter() - start) * 1000
+        await self._complete(count)
+        self.flushes += 1
+        self.last_flush_ms = elapsed
+        self.max_flush_ms = max(self.max_flush_ms, elapsed)
+
+    async def _complete(self, count: int):
+        async with self._done:
+            self.completed += count
+            self._done.notify_all()
+
+    async def _run(self):
+        if self._batch:
+            # Left by a task that died mid-batch
+            self.failed += len(self._batch)
+            await self._complete(len(self._batch))
+            self._batch = []
+        loop = asyncio.get_running_loop()
+        while True:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                return
+            batch = self._batch = [entry]
+            deadline = loop.time() + self.flush_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    entry = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        entry = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            await self._write(batch)
+            self._batch = []
+            if stopping:
+                return
+
+    async def drain(self):
+        """
+        Waits until every entry submitted before the call has been written (or has
+        failed for good). Entries submitted meanwhile are not waited for.
+        """
+        if self._task is None:
+            return
+        target = self.enqueued
+        async with self._done:
+            await self._done.wait_for(lambda: self.completed >= target)
+
+    def _on_done(self, task: asyncio.Task):
+        if task is not self._task or task.cancelled():
+            return
+        error = task.exception()
+        if error is None:
+            return
+        logger.error("Log writer task died, restarting it", exc_info=error)
+        self.restarts += 1
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(self._on_done)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self._task.add_done_callback(self._on_done)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        # The sentinel queues behind every pending entry, so they are all written first
+        await self._queue.put(_STOP)
+        while True:
+            task = self._task
+            try:
+                await task
+            except Exception:
+                pass
+            # Restarted by _on_done if it died before reaching the sentinel
+            if self._task is task:
+                break
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "overflow": self.overflow,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "retries": self.retries,
+            "restarts": self.restarts,
+            "flushes": self.flushes,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+        }
+
+log_writer = LogWriter(
+    logs_collection,
+    max_queue=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("LOG_BATCH_SIZE", "500")),
+    flush_interval_ms=int(os.getenv("LOG_FLUSH_MS", "200")),
+    overflow=os.getenv("LOG_QUEUE_OVERFLOW", "block"),
+    max_retries=int(os.getenv("LOG_WRITE_RETRIES", "5")),
+)
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """
+    Groups concurrent requests into batches for a handler that takes a list.
+
+    A batch is dispatched once it holds `max_items` items or `max_wait` seconds after
+    its first item arrived, whichever comes first, and each caller's future is
+    resolved with its own result. If the handler returns None (e.g. its batched
+    answer could not be parsed), every item of the batch is retried on its own
+    through `fallback`. Handler errors are raised to every caller of the batch.
+    """
+
+    def __init__(self, handler: Callable[[List[Any]], Awaitable[Optional[List[Any]]]],
+                 fallback: Optional[Callable[[Any], Awaitable[Any]]] = None,
+                 max_items: int = 8, max_wait: float = 0.025):
+        self.handler = handler
+        self.fallback = fallback
+        self.max_items = max_items
+        self.max_wait = max_wait
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.items = 0
+        self.batches = 0
+        self.full_batches = 0
+        self.fallbacks = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_items:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._dispatch)
+        return await future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        items = [item for item, _ in batch]
+        self.items += len(items)
+        self.batches += 1
+        if len(items) >= self.max_items:
+            self.full_batches += 1
+        started = time.perf_counter()
+        try:
+            results = await self.handler(items)
+            if (results is None or len(results) != len(items)) and self.fallback is not None:
+                self.fallbacks += 1
+                logger.warning(f"Batch of {len(items)} failed, retrying its items one by one")
+                results = await asyncio.gather(*(self.fallback(item) for item in items), return_exceptions=True)
+            elif results is None or len(results) != len(items):
+                raise ValueError(f"Batch handler returned no usable results for {len(items)} items")
+        except Exception as e:
+            self.errors += 1
+            results = [e] * len(items)
+        finally:
+            self.seconds += time.perf_counter() - started
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def stop(self):
+        self._dispatch()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "full_batches": self.full_batches,
+            "fallbacks": self.fallbacks,
+            "errors": self.errors,
+            "avg_batch_seconds": round(self.seconds / self.batches, 3) if self.batches else 0.0,
+        }
@@ -0,0 +1,100 @@
+import base64
+import binascii
+import datetime
+import json
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Query
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Sort specs are lists of (field, direction) pairs that end with ("_id", ...), so every
+# key is unique and a page boundary can be resumed with a plain range predicate.
+Sort = List[Tuple[str, int]]
+
+def _encode_value(value):
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    if isinstance(value, datetime.datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+def _decode_value(value):
+    if isinstance(value, dict) and "$oid" in value:
+        return ObjectId(value["$oid"])
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.datetime.fromisoformat(value["$date"])
+    return value
+
+def encode_cursor(doc: dict, sort: Sort) -> str:
+    values = [_encode_value(doc.get(field)) for field, _ in sort]
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return [_decode_value(value) for value in json.loads(raw)]
+    except (binascii.Error, ValueError, InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+class PageParams:
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        after: Optional[str] = Query(None),
+        before: Optional[str] = Query(None),
+    ):
+        if after and before:
+            raise HTTPException(status_code=400, detail="Use either 'after' or 'before', not both")
+        self.limit = limit
+        self.after = after
+        self.before = before
+        # Decoded here so a malformed cursor is a 400 before the handler runs
+        self.values = decode_cursor(after or before) if (after or before) else None
+
+def keyset_filter(sort: Sort, values: list, forward: bool) -> dict:
+    # (a, b, _id) > (va, vb, vid)  ==>  a > va OR (a == va AND b > vb) OR (a == va AND b == vb AND _id > vid)
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        op = "$gt" if (direction == 1) == forward else "$lt"
+        clause = {prefix: value for (prefix, _), value in zip(sort[:i], values[:i])}
+        clause[field] = {op: values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+async def paginate(collection, query: dict, sort: Sort, page: PageParams, projection: Optional[dict] = None):
+    """
+    Fetches one page of `collection` in `sort` order, starting strictly after (or before)
+    the position encoded in the page's cursor. Every page is a single bounded index range
+    scan, so page N costs the same as page 1.
+
+    Returns:
+        tuple: (documents, next_cursor, prev_cursor); a cursor is None when there is nothing more that way.
+    """
+    forward = page.before is None
+    filters = [query] if query else []
+    if page.values is not None:
+        if len(page.values) != len(sort):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        filters.append(keyset_filter(sort, page.values, forward))
+    mongo_filter = {"$and": filters} if len(filters) > 1 else (filters[0] if filters else {})
+    order = sort if forward else [(field, -direction) for field, direction in sort]
+
+    docs = await collection.find(mongo_filter, projection).sort(order).limit(page.limit + 1).to_list(page.limit + 1)
+    has_more = len(docs) > page.limit
+    docs = docs[:page.limit]
+    if not forward:
+        docs.reverse()
+
+    if not docs:
+        return docs, None, None
+    if forward:
+        next_cursor = encode_cursor(docs[-1], sort) if has_more else None
+        prev_cursor = encode_cursor(docs[0], sort) if page.after else None
+    else:
+        next_cursor = encode_cursor(docs[-1], sort)
+        prev_cursor = encode_cursor(docs[0], sort) if has_more else None
+    return docs, next_cursor, prev_cursor
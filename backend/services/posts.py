@@ -0,0 +1,58 @@
+from typing import Dict, Iterable, List
+from bson import ObjectId
+from models.comment import Comment
+from models.post import PostResponse
+from services.counters import post_counters
+from services.database import comments_collection, posts_collection
+
+DEFAULT_COMMENTS_LIMIT = 100
+
+async def load_comments(post_ids: Iterable[str], limit: int = DEFAULT_COMMENTS_LIMIT) -> Dict[str, List[Comment]]:
+    # One aggregation for the whole page: each post pulls its own first `limit`
+    # comments through a $lookup whose pipeline is capped with $limit, so a post with
+    # a long thread is read no further than the (post_id, _id) index entries it needs.
+    post_ids = list(dict.fromkeys(post_ids))
+    grouped: Dict[str, List[Comment]] = {post_id: [] for post_id in post_ids}
+    object_ids = [ObjectId(post_id) for post_id in post_ids if ObjectId.is_valid(post_id)]
+    if not object_ids or limit <= 0:
+        return grouped
+    pipeline = [
+        {"$match": {"_id": {"$in": object_ids}}},
+        {"$project": {"_id": 1}},
+        {"$lookup": {
+            "from": comments_collection.name,
+            "let": {"post_id": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$post_id", "$$post_id"]}}},
+                {"$sort": {"_id": 1}},
+                {"$limit": limit}
+            ],
+            "as": "comments"
+        }}
+    ]
+    async for post in posts_collection.aggregate(pipeline):
+        grouped[str(post["_id"])] = [
+            Comment(**{k: str(v) if isinstance(v, ObjectId) else v for k, v in comment.items()})
+            for comment in post["comments"]
+        ]
+    return grouped
+
+def build_post_response(post: dict, comments: List[Comment]) -> PostResponse:
+    post = post_counters.merge_into(dict(post))
+    return PostResponse(
+        id=str(post["_id"]),
+        title=post["title"],
+        author_id=post["author_id"],
+        content=post["content"],
+        hashtags=post["hashtags"],
+        pictures=post.get("pictures", []),
+        videos=post.get("videos", []),
+        likes_count=post["likes_count"],
+        dislikes_count=post["dislikes_count"],
+        comments_count=post["comments_count"],
+        comments=comments
+    )
+
+async def build_post_responses(posts: List[dict], comments_limit: int = DEFAULT_COMMENTS_LIMIT) -> List[PostResponse]:
+    comments = await load_comments([str(post["_id"]) for post in posts], comments_limit)
+    return [build_post_response(post, comments[str(post["_id"])]) for post in posts]
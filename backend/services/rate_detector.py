@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+from array import array
+from collections import OrderedDict
+from typing import Optional
+from services.database import detected_collection
+from services.detections import DetectionSink
+from services.detectors import HIGH_FREQUENCY_REASON, WINDOW_EVENTS, WINDOW_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class _Ring:
+    __slots__ = ("times", "pos", "count", "last_seen")
+
+    def __init__(self, size: int):
+        self.times = array("d", bytes(8 * size))
+        self.pos = 0
+        self.count = 0
+        self.last_seen = 0.0
+
+class RateDetector:
+    """
+    Streaming high-frequency detector fed straight from log_action.
+
+    Each active user has a fixed ring of the last `window_events + 1` interaction
+    times (8 bytes each), so checking "did the oldest of those happen less than
+    `window_seconds` ago?" is O(1) per event. Rings idle for `idle_seconds` are
+    evicted, and at most `max_users` are kept. Flags are queued and written by a
+    background task every `flush_interval` seconds. A flagged user is ignored for
+    `flag_ttl_seconds` (at most `max_flagged` of them are remembered); after that
+    they are watched again, and flagging them twice is harmless.
+    """
+
+    def __init__(self, window_seconds: float = WINDOW_SECONDS, window_events: int = WINDOW_EVENTS,
+                 idle_seconds: float = 300.0, max_users: int = 100_000, flush_interval: float = 0.25,
+                 flag_ttl_seconds: float = 3600.0, max_flagged: int = 100_000, collection=detected_collection):
+        self.window_seconds = window_seconds
+        self.size = window_events + 1
+        self.idle_seconds = idle_seconds
+        self.max_users = max_users
+        self.flush_interval = flush_interval
+        self.flag_ttl_seconds = flag_ttl_seconds
+        self.max_flagged = max_flagged
+        self.collection = collection
+        self._rings: "OrderedDict[str, _Ring]" = OrderedDict()
+        # username: when it was flagged, oldest first
+        self._flagged: "OrderedDict[str, float]" = OrderedDict()
+        # (username, monotonic time of the triggering event), waiting to be written
+        self._pending = []
+        self._stopping = asyncio.Event()
+        self._task = None
+        self.events = 0
+        self.flags = 0
+        self.evictions = 0
+        self.last_flag_delay_ms = 0.0
+        self.max_flag_delay_ms = 0.0
+
+    def observe(self, username: str, now: Optional[float] = None) -> bool:
+        if now is None:
+            now = time.monotonic()
+        flagged_at = self._flagged.get(username)
+        if flagged_at is not None:
+            if now - flagged_at < self.flag_ttl_seconds:
+                return False
+            del self._flagged[username]
+        self.events += 1
+        rings = self._rings
+        ring = rings.get(username)
+        if ring is None:
+            ring = rings[username] = _Ring(self.size)
+            # Stamped before evicting, or the new ring itself looks idle
+            ring.last_seen = now
+            self._evict(now)
+        else:
+            rings.move_to_end(username)
+            ring.last_seen = now
+        ring.times[ring.pos] = now
+        ring.pos = (ring.pos + 1) % self.size
+        ring.count += 1
+        # After the write, ring.pos points at the oldest of the last `size` events
+        if ring.count >= self.size and now - ring.times[ring.pos] < self.window_seconds:
+            self._remember_flag(username, now)
+            del rings[username]
+            self._pending.append((username, time.monotonic()))
+            self.flags += 1
+            return True
+        return False
+
+    def _remember_flag(self, username: str, now: float):
+        flagged = self._flagged
+        flagged[username] = now
+        while flagged:
+            oldest = next(iter(flagged.values()))
+            if len(flagged) <= self.max_flagged and now - oldest < self.flag_ttl_seconds:
+                break
+            flagged.popitem(last=False)
+
+    def _evict(self, now: float):
+        rings = self._rings
+        while rings:
+            username, oldest = next(iter(rings.items()))
+            if len(rings) <= self.max_users and now - oldest.last_seen < self.idle_seconds:
+                break
+            del rings[username]
+            self.evictions += 1
+
+    async def flush(self):
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        sink = DetectionSink(self.collection)
+        for username, _ in pending:
+            sink.flag(username, HIGH_FREQUENCY_REASON)
+        try:
+            await sink.commit()
+        except (Exception, asyncio.CancelledError) as e:
+            # Cancelled mid-commit included: the upserts are idempotent, so retrying
+            # is safe and dropping the flags is not
+            logger.error(f"Recording {len(pending)} rate flags failed: {e!r}")
+            self._pending.extend(pending)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+        # From the triggering event to the flag being written
+        written = time.monotonic()
+        self.last_flag_delay_ms = (written - pending[-1][1]) * 1000
+        self.max_flag_delay_ms = max(self.max_flag_delay_ms, (written - pending[0][1]) * 1000)
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Cooperative: a commit that is already running is allowed to finish
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "tracked_users": len(self._rings),
+            "flagged_users": len(self._flagged),
+            "events": self.events,
+            "flags": self.flags,
+            "evictions": self.evictions,
+            "last_flag_delay_ms": self.last_flag_delay_ms,
+            "max_flag_delay_ms": self.max_flag_delay_ms,
+        }
+
+rate_detector = RateDetector()
@@ -0,0 +1,151 @@
+# Retention: moves old interaction logs and completed chat analyses out of Mongo into
+# gzip NDJSON archive files, partitioned by day:
+#
+#   ARCHIVE_DIR/<collection>/<YYYY-MM-DD>/<first _id of the part>.ndjson.gz
+#
+# and streams them back for investigations. Run from backend/:
+#   python -m services.retention archive
+#   python -m services.retention replay --start 2025-01-01 --end 2025-02-01 [--record]
+import argparse
+import asyncio
+import datetime
+import gzip
+import logging
+import os
+from typing import Iterator, Optional
+from bson import json_util
+from models.event import EventType
+from routers.analyser import replay_events
+from services.database import honeytraps_collection, logs_collection, analysis_collection
+from services.detections import DetectionSink
+from services.honeytrap_stats import honeytrap_stats
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+# name: (collection, time field, extra filter, retention)
+ARCHIVES = {
+    "logs": (logs_collection, "ts", {}, datetime.timedelta(days=int(os.getenv("LOG_RETENTION_DAYS", "30")))),
+    "analysis": (analysis_collection, "timestamp", {"status": "completed"},
+                 datetime.timedelta(days=int(os.getenv("ANALYSIS_RETENTION_DAYS", "90")))),
+}
+JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS
+
+async def fold_archived_logs(docs: list):
+    # The statistics reconcile counts honeytrap events from the logs still in Mongo,
+    # so a batch's counts are kept as a baseline before it is deleted
+    actors = {doc.get("actor") for doc in docs if doc.get("actor")}
+    honeytraps = {
+        honeytrap["username"]
+        async for honeytrap in honeytraps_collection.find({"username": {"$in": list(actors)}}, {"username": 1})
+    }
+    counts = {}
+    for doc in docs:
+        if doc.get("actor") in honeytraps:
+            fields = counts.setdefault(doc["actor"], {"interactions": 0, "friend_requests": 0})
+            fields["interactions"] += 1
+            fields["friend_requests"] += doc.get("type") == EventType.FRIEND_REQUEST_SENT.value
+    await honeytrap_stats.fold_archived(str(docs[0]["_id"]), counts)
+
+# Run on each batch after it is written to the archive and before it is deleted
+BEFORE_DELETE = {"logs": fold_archived_logs}
+
+def _write_part(path: str, docs: list):
+    # Written under a temporary name and renamed, so a part is either complete or
+    # absent. Re-archiving the same batch after a crash rewrites the same file.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for doc in docs:
+            f.write(json_util.dumps(doc, json_options=JSON_OPTIONS))
+            f.write("\n")
+    os.replace(tmp_path, path)
+
+async def archive_collection(name: str, now: Optional[datetime.datetime] = None) -> int:
+    """
+    Archives and deletes every document of one collection older than its retention.
+
+    Each batch is written to its day partitions before it is deleted, so a crash
+    between the two at worst archives the batch again on the next run.
+
+    Args:
+        name (str): A key of ARCHIVES.
+        now (datetime): Reference time, naive UTC; defaults to now.
+
+    Returns:
+        int: Number of documents archived.
+    """
+    collection, time_field, extra, retention = ARCHIVES[name]
+    cutoff = (now or datetime.datetime.utcnow()) - retention
+    query = {**extra, time_field: {"$lt": cutoff}}
+    archived = 0
+    while True:
+        docs = await collection.find(query).sort("_id", 1).limit(RETENTION_BATCH_SIZE).to_list(RETENTION_BATCH_SIZE)
+        if not docs:
+            break
+        parts = {}
+        for doc in docs:
+            parts.setdefault(doc[time_field].date().isoformat(), []).append(doc)
+        for day, part in parts.items():
+            _write_part(os.path.join(ARCHIVE_DIR, name, day, f"{part[0]['_id']}.ndjson.gz"), part)
+        if name in BEFORE_DELETE:
+            await BEFORE_DELETE[name](docs)
+        await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+        archived += len(docs)
+    if archived:
+        logger.info(f"Archived {archived} {name} documents older than {cutoff}")
+    return archived
+
+async def run_retention() -> dict:
+    return {name: await archive_collection(name) for name in ARCHIVES}
+
+def read_archive(name: str, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> Iterator[dict]:
+    """
+    Streams archived documents back, oldest first.
+
+    Args:
+        name (str): A key of ARCHIVES.
+        start (date): First day to read, inclusive.
+        end (date): Last day to read, exclusive.
+
+    Yields:
+        dict: Documents as they were stored, with ObjectIds and datetimes restored.
+    """
+    root = os.path.join(ARCHIVE_DIR, name)
+    if not os.path.isdir(root):
+        return
+    for day in sorted(os.listdir(root)):
+        date = datetime.date.fromisoformat(day)
+        if (start and date < start) or (end and date >= end):
+            continue
+        # Part names are hex ObjectIds, so name order is _id order
+        for part in sorted(p for p in os.listdir(os.path.join(root, day)) if p.endswith(".ndjson.gz")):
+            with gzip.open(os.path.join(root, day, part), "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield json_util.loads(line, json_options=JSON_OPTIONS)
+
+async def replay(start: Optional[datetime.date], end: Optional[datetime.date], record: bool):
+    sink = DetectionSink() if record else DetectionSink(collection=None)
+    states = await replay_events(read_archive("logs", start, end), sink)
+    for username, reasons in sorted(sink.detections.items()):
+        print(f"{username}: {', '.join(reasons)}")
+    print(f"Replayed events of {len(states)} users, {len(sink.detections)} flagged")
+
+def main():
+    parser = argparse.ArgumentParser(description="Log retention and archive replay")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("archive", help="Archive and delete documents past their retention")
+    replay_parser = commands.add_parser("replay", help="Run the detectors over archived logs")
+    replay_parser.add_argument("--start", type=datetime.date.fromisoformat)
+    replay_parser.add_argument("--end", type=datetime.date.fromisoformat)
+    replay_parser.add_argument("--record", action="store_true", help="Write flags to the detected collection")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "archive":
+        print(asyncio.run(run_retention()))
+    else:
+        asyncio.run(replay(args.start, args.end, args.record))
+
+if __name__ == "__main__":
+    main()
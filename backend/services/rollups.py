@@ -0,0 +1,109 @@
+import datetime
+from typing import List, Optional
+from services.counters import CounterAggregator
+from services.database import rollups_collection
+from services.honeytrap_roster import honeytrap_roster
+from services.trending import bucket_start
+
+# Interaction counts per honeytrap, per actor and per event type, in minute, hour and
+# day buckets. Every event is counted into all three granularities as it is logged,
+# so older data is already downsampled when its fine buckets expire after their
+# RETENTION (through the TTL index on expires_at); day buckets are kept.
+BUCKET_SIZES = {
+    "minute": datetime.timedelta(minutes=1),
+    "hour": datetime.timedelta(hours=1),
+    "day": datetime.timedelta(days=1),
+}
+RETENTION = {
+    "minute": datetime.timedelta(days=2),
+    "hour": datetime.timedelta(days=90),
+    "day": None,
+}
+MAX_POINTS = 2000
+
+def naive_utc(ts: datetime.datetime) -> datetime.datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return ts
+
+def pick_granularity(start: datetime.datetime, end: datetime.datetime) -> str:
+    # The finest granularity still retained for `start` that stays under MAX_POINTS
+    age = datetime.datetime.utcnow() - start
+    for granularity, size in BUCKET_SIZES.items():
+        retention = RETENTION[granularity]
+        if (retention is None or age <= retention) and (end - start) / size <= MAX_POINTS:
+            return granularity
+    return "day"
+
+class ActivityRollups:
+    """
+    Time-bucketed activity counters fed by log_action.
+
+    Each event increments one bucket document per (dimension, granularity), whose
+    identifying fields are only written when the bucket is created; the
+    increments are merged in memory and written behind by a CounterAggregator, so
+    logging stays a dict update and a busy minute costs one upsert per bucket.
+    """
+
+    def __init__(self, collection=rollups_collection):
+        self.collection = collection
+        self.counters = CounterAggregator(collection, upsert=True)
+
+    def observe(self, event: dict):
+        actor, target = event["actor"], event.get("target")
+        honeytrap = target if target in honeytrap_roster else (actor if actor in honeytrap_roster else None)
+        keys = {"honeytrap": honeytrap, "actor": actor, "type": event["type"]}
+        for granularity, size in BUCKET_SIZES.items():
+            bucket = bucket_start(event["ts"], size)
+            for dimension, key in keys.items():
+                if key is None:
+                    continue
+                doc_id = f"{granularity}|{dimension}|{key}|{bucket.isoformat()}"
+                self.counters.incr(doc_id, "count")
+                fields = {"granularity": granularity, "dimension": dimension, "key": key, "bucket": bucket}
+                if RETENTION[granularity] is not None:
+                    fields["expires_at"] = bucket + size + RETENTION[granularity]
+                self.counters.set_on_insert(doc_id, fields)
+
+    async def timeseries(self, dimension: str, key: str, start: datetime.datetime, end: datetime.datetime,
+                         granularity: Optional[str] = None) -> List[dict]:
+        """
+        Reads a zero-filled series of interaction counts.
+
+        Args:
+            dimension (str): "honeytrap", "actor" or "type".
+            key (str): The honeytrap username, actor username or event type.
+            start (datetime): Inclusive start, naive UTC.
+            end (datetime): Exclusive end, naive UTC.
+            granularity (str): "minute", "hour" or "day"; picked from the range if None.
+
+        Returns:
+            list: {"bucket", "count"} for every bucket in the range, oldest first.
+        """
+        granularity = granularity or pick_granularity(start, end)
+        size = BUCKET_SIZES[granularity]
+        first = bucket_start(start, size)
+        counts = {
+            doc["bucket"]: doc["count"]
+            async for doc in self.collection.find(
+                {"dimension": dimension, "key": key, "granularity": granularity, "bucket": {"$gte": first, "$lt": end}},
+                {"bucket": 1, "count": 1, "_id": 0}
+            )
+        }
+        points = []
+        bucket = first
+        while bucket < end:
+            points.append({"bucket": bucket, "count": counts.get(bucket, 0)})
+            bucket += size
+        return points
+
+    def start(self):
+        self.counters.start()
+
+    async def stop(self):
+        await self.counters.stop()
+
+    def stats(self) -> dict:
+        return self.counters.stats()
+
+activity_rollups = ActivityRollups()
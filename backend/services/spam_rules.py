@@ -0,0 +1,106 @@
+import json
+import os
+import re
+from typing import List
+
+# A rule pack is a plain dict, e.g. loaded from the JSON file named by SPAM_RULES_PATH:
+#   {
+#     "keywords": ["buy now", "free"],          case-insensitive substrings
+#     "domains": ["bit.ly", "example.com"],     the domain or any subdomain of it
+#     "urls": true,                             any http(s):// or www. link
+#     "regexes": {"crypto": "\\b(btc|eth)\\s*giveaway\\b"},
+#     "repeated_chars": 6                       a run of 6+ identical non-space characters
+#   }
+# Text is lowercased once before matching, so regexes should be written in lowercase.
+# They must not use numbered backreferences, since every rule is also compiled into one
+# combined pattern.
+DEFAULT_RULE_PACK = {
+    "keywords": ["http", "www", "click here", "buy now", "free", "!!!", "###"],
+    "domains": [],
+    "urls": False,
+    "regexes": {},
+    "repeated_chars": 0,
+}
+
+SPAM_RULES_PATH = os.getenv("SPAM_RULES_PATH")
+
+URL_PATTERN = r"(?:https?://|www\.)\S+"
+
+def _trie_pattern(words: List[str]) -> str:
+    # "buy now|buy cheap" -> "buy\ (?:cheap|now)": with shared prefixes factored out
+    # the regex engine tries each character once instead of once per keyword
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+    return build(trie)
+
+def load_rule_pack(path: str) -> dict:
+    with open(path) as f:
+        return {**DEFAULT_RULE_PACK, **json.load(f)}
+
+class SpamMatcher:
+    """
+    Matches text against every rule of a pack at once.
+
+    All rules are joined into one alternation, with keywords and domains folded into
+    a single prefix trie, so clean text, the common case, costs one regex scan however
+    many rules there are. The combined pattern only checks domains as substrings; text
+    that hits it is re-checked rule by rule, which also reports which rules matched.
+    Text is lowercased up front rather than compiling with re.IGNORECASE, which is
+    several times slower.
+    """
+
+    def __init__(self, pack: dict = DEFAULT_RULE_PACK):
+        keywords = [keyword.lower() for keyword in pack.get("keywords", [])]
+        domains = [domain.lower() for domain in pack.get("domains", [])]
+        rules = [(f"keyword:{keyword}", re.escape(keyword)) for keyword in keywords]
+        # Matches the domain and its subdomains: "bit.ly", "m.bit.ly", not "orbit.ly"
+        rules += [(f"domain:{domain}", rf"(?<![\w-]){re.escape(domain)}(?![\w-])") for domain in domains]
+        others = []
+        if pack.get("urls"):
+            others.append(("url", URL_PATTERN))
+        for name, pattern in pack.get("regexes", {}).items():
+            others.append((f"regex:{name}", pattern))
+        run = pack.get("repeated_chars", 0)
+        if run > 1:
+            others.append(("repeated_chars", rf"(?P<repeated>\S)(?P=repeated){{{run - 1},}}"))
+        rules += others
+
+        self.rule_names = [name for name, _ in rules]
+        self._rules = [(name, re.compile(pattern)) for name, pattern in rules]
+        combined = [f"(?:{pattern})" for _, pattern in others]
+        if keywords or domains:
+            combined.insert(0, _trie_pattern(keywords + domains))
+        self._combined = re.compile("|".join(combined) or "(?!)")
+
+    def is_spam(self, text: str) -> bool:
+        text = text.lower()
+        if self._combined.search(text) is None:
+            return False
+        return any(rule.search(text) for _, rule in self._rules)
+
+    def match(self, text: str) -> List[str]:
+        """
+        Lists the rules a text matches.
+
+        Args:
+            text (str): The comment or message text.
+
+        Returns:
+            list: Names of the matched rules, e.g. ["keyword:free", "url"]; empty if clean.
+        """
+        text = text.lower()
+        if self._combined.search(text) is None:
+            return []
+        return [name for name, rule in self._rules if rule.search(text)]
+
+spam_matcher = SpamMatcher(load_rule_pack(SPAM_RULES_PATH) if SPAM_RULES_PATH else DEFAULT_RULE_PACK)
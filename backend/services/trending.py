@@ -0,0 +1,51 @@
+import datetime
+from typing import Iterable, List
+from pymongo import UpdateOne
+from services.database import hashtag_counters_collection
+
+# Rolling windows are answered from time-bucketed counters: minute buckets cover the
+# last hour and hour buckets cover the last day. Buckets expire through a TTL index
+# once they fall out of every window that reads them.
+WINDOWS = {
+    "hour": ("minute", datetime.timedelta(hours=1)),
+    "day": ("hour", datetime.timedelta(days=1)),
+}
+BUCKET_SIZES = {
+    "minute": datetime.timedelta(minutes=1),
+    "hour": datetime.timedelta(hours=1),
+}
+
+def normalize_hashtag(tag: str) -> str:
+    return tag.strip().lstrip("#").lower()
+
+def bucket_start(now: datetime.datetime, size: datetime.timedelta) -> datetime.datetime:
+    epoch = datetime.datetime(1970, 1, 1)
+    return now - (now - epoch) % size
+
+async def record_hashtags(hashtags: Iterable[str]):
+    tags = [tag for tag in dict.fromkeys(hashtags) if tag]
+    if not tags:
+        return
+    now = datetime.datetime.utcnow()
+    operations = []
+    for window, (granularity, span) in WINDOWS.items():
+        size = BUCKET_SIZES[granularity]
+        bucket = bucket_start(now, size)
+        for tag in tags:
+            operations.append(UpdateOne(
+                {"granularity": granularity, "bucket": bucket, "tag": tag},
+                {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": bucket + span + size}},
+                upsert=True
+            ))
+    await hashtag_counters_collection.bulk_write(operations, ordered=False)
+
+async def trending_hashtags(window: str = "hour", limit: int = 10) -> List[dict]:
+    granularity, span = WINDOWS[window]
+    since = bucket_start(datetime.datetime.utcnow() - span, BUCKET_SIZES[granularity])
+    return await hashtag_counters_collection.aggregate([
+        {"$match": {"granularity": granularity, "bucket": {"$gt": since}}},
+        {"$group": {"_id": "$tag", "count": {"$sum": "$count"}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "tag": "$_id", "count": 1}}
+    ]).to_list(limit)
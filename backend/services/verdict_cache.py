@@ -0,0 +1,159 @@
+import asyncio
+import datetime
+import hashlib
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+from pymongo.errors import PyMongoError
+from services.database import verdicts_collection
+
+logger = logging.getLogger(__name__)
+
+# LLM verdicts on honeytrap comments, keyed on a fingerprint of the normalized text so
+# the copies a spam campaign pastes across posts are classified once. With
+# VERDICT_CACHE_SCOPE=post the post id is part of the key, since the LLM also sees the
+# post it is asked about. Verdicts are also stored in Mongo unless
+# VERDICT_CACHE_PERSIST=0, so they survive restarts; stored ones expire after
+# VERDICT_CACHE_TTL_DAYS.
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "10000"))
+VERDICT_CACHE_SCOPE = os.getenv("VERDICT_CACHE_SCOPE", "content")
+VERDICT_CACHE_PERSIST = os.getenv("VERDICT_CACHE_PERSIST", "1") != "0"
+VERDICT_CACHE_TTL = datetime.timedelta(days=int(os.getenv("VERDICT_CACHE_TTL_DAYS", "30")))
+# Only clean answers are cached; anything else is asked again next time
+CACHEABLE_VERDICTS = {"yes", "no"}
+
+_URL_RE = re.compile(r"(?:https?://|www\.)[^\s<>\"']+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def _canonical_url(match: re.Match) -> str:
+    # Scheme, "www.", query, fragment and trailing punctuation or slashes are
+    # dropped, so links differing only in tracking parameters or scheme compare equal
+    url = re.sub(r"^(?:https?://)?(?:www\.)?", "", match.group(0))
+    url = re.split(r"[?#]", url, 1)[0].rstrip("/.,;:!)")
+    return f"<{url}>"
+
+def normalize_comment(text: str) -> str:
+    text = _URL_RE.sub(_canonical_url, text.lower())
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+def verdict_key(text: str, post_id: Optional[str] = None, scope: str = VERDICT_CACHE_SCOPE) -> str:
+    normalized = normalize_comment(text)
+    if scope == "post" and post_id is not None:
+        normalized = f"{post_id}\0{normalized}"
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+class VerdictCache:
+    """
+    Bounded LRU of comment verdicts in front of the LLM, optionally backed by Mongo.
+
+    Concurrent lookups of a key that is not cached yet share one computation, so a
+    burst of identical comments costs a single LLM call.
+    """
+
+    def __init__(self, max_entries: int = VERDICT_CACHE_SIZE, collection=verdicts_collection if VERDICT_CACHE_PERSIST else None):
+        self.max_entries = max_entries
+        self.collection = collection
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.stored_hits = 0
+        self.shared = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remember(self, key: str, verdict: str):
+        self._entries[key] = verdict
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _load(self, key: str) -> Optional[str]:
+        if self.collection is None:
+            return None
+        try:
+            doc = await self.collection.find_one({"_id": key}, {"verdict": 1})
+        except PyMongoError as e:
+            logger.error(f"Verdict cache read failed: {e}")
+            return None
+        return doc["verdict"] if doc else None
+
+    async def _store(self, key: str, verdict: str, text: Optional[str]):
+        if self.collection is None:
+            return
+        now = datetime.datetime.utcnow()
+        fields = {"verdict": verdict, "updated_at": now, "expires_at": now + VERDICT_CACHE_TTL}
+        if text is not None:
+            # Kept as training data for the local pre-classifier
+            fields["text"] = text
+        try:
+            await self.collection.update_one({"_id": key}, {"$set": fields}, upsert=True)
+        except PyMongoError as e:
+            logger.error(f"Verdict cache write failed: {e}")
+
+    async def classify(self, key: str, compute: Callable[[], Awaitable[str]], text: Optional[str] = None) -> str:
+        """
+        Returns the cached verdict for `key`, computing and caching it on a miss.
+
+        Args:
+            key (str): From `verdict_key`.
+            compute (callable): Coroutine function asking the LLM for the verdict.
+            text (str): The comment, stored with a persisted verdict.
+
+        Returns:
+            str: The verdict.
+        """
+        verdict = self._entries.get(key)
+        if verdict is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return verdict
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.shared += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            verdict = await self._load(key)
+            if verdict is not None:
+                self.stored_hits += 1
+            else:
+                self.misses += 1
+                verdict = await compute()
+                if verdict in CACHEABLE_VERDICTS:
+                    await self._store(key, verdict, text)
+            if verdict in CACHEABLE_VERDICTS:
+                self._remember(key, verdict)
+            future.set_result(verdict)
+            return verdict
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters get the error; retrieve it here so an unshared future does not
+            # log "exception was never retrieved"
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._pending[key]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stored_hits + self.shared + self.misses
+        saved = lookups - self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stored_hits": self.stored_hits,
+            "shared": self.shared,
+            "misses": self.misses,
+            "hit_rate": saved / lookups if lookups else 0.0,
+            "llm_calls_saved": saved,
+            "evictions": self.evictions,
+        }
+
+verdict_cache = VerdictCache()
@@ -47,7 +47,7 @@ export const getUserProfile = async () => {
 
 export const getDetectedUsers = async () => {
   const response = await axios.get('/chat/detected-users');
-  return response.data;
+  return response.data.items;
 };
 
 interface Message {
@@ -72,13 +72,13 @@ export const getAnalysisResult = async (friendId: string) => {
 //Posts
 export const getPosts = async () => {
   const response = await axios.get('/post/posts');
-  return response.data;
+  return response.data.items;
 };
 
 export const getUserPosts = async (user_id: string) => {
   const url=`/post/user/${user_id}`;
   const response = await axios.get(url);  
-  return response.data;
+  return response.data.items;
 };
 
 export const createPost = async (title: string, content: string, hashtags: string[],pictures: string[], videos: string[]) => {
@@ -109,7 +109,7 @@ export const sendMessage = async (receiver_id: string, message: string) => {
 
 export const getMessages = async (friendId: string) => {
   const response = await axios.get(`chat/messages/${friendId}`);
-  return response.data;
+  return response.data.items;
 };
 
 //Friends
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { getHoneypots, getHoneytrapLogs } from '../services/api'; 
+import { getHoneypots, getHoneytrapLogs, getHoneytrapTimeseries } from '../services/api'; 
 import './Log.css';
 
 type Honeypot = {
@@ -11,15 +11,23 @@ type Honeypot = {
 };
 
 type LogEntry = {
-  username: string;
+  type: string;
+  actor: string;
+  target?: string;
   action: string;
-  timestamp: string;
+  ts: string;
+};
+
+type ActivityPoint = {
+  bucket: string;
+  count: number;
 };
 
 const Log: React.FC = () => {
   const [honeytraps, setHoneytraps] = useState<Honeypot[]>([]);
   const [selectedHoneytrap, setSelectedHoneytrap] = useState<Honeypot | null>(null);
   const [logs, setLogs] = useState<LogEntry[]>([]);
+  const [activity, setActivity] = useState<ActivityPoint[]>([]);
   const [searchTerm, setSearchTerm] = useState<string>('');
 
   useEffect(() => {
@@ -44,6 +52,15 @@ const Log: React.FC = () => {
     }
   };
 
+  const fetchActivity = async (username: string) => {
+    try {
+      const data = await getHoneytrapTimeseries(username);
+      setActivity(data);
+    } catch (error) {
+      console.error('Failed to fetch activity', error);
+    }
+  };
+
   const handleSearch = () => {
     if (searchTerm) {
       setHoneytraps(honeytraps.filter((honeytrap) => honeytrap.username.includes(searchTerm)));
@@ -55,8 +72,11 @@ const Log: React.FC = () => {
   const handleRowClick = (honeytrap: Honeypot) => {
     setSelectedHoneytrap(honeytrap);
     fetchLogs(honeytrap.username);
+    fetchActivity(honeytrap.username);
   };
 
+  const maxActivity = Math.max(1, ...activity.map((point) => point.count));
+
   return (
     <div className="log-page">
       <h1>HoneyTrap Log</h1>
@@ -91,10 +111,20 @@ const Log: React.FC = () => {
             <>
               <h2>Logs for {selectedHoneytrap.username}</h2>
               <p>Purpose: {selectedHoneytrap.purpose}</p>
+              <div className="activity-chart" title="Interactions per minute, last hour">
+                {activity.map((point) => (
+                  <div
+                    key={point.bucket}
+                    className="activity-bar"
+                    style={{ height: `${(point.count / maxActivity) * 100}%` }}
+                    title={`${point.bucket}: ${point.count}`}
+                  />
+                ))}
+              </div>
               <ul>
                 {logs.map((log, index) => (
                   <li key={index}>
-                    <p>{log.timestamp}: {log.action}</p>
+                    <p>{log.ts}: {log.actor}: {log.action}</p>
                   </li>
                 ))}
               </ul>
@@ -17,15 +17,19 @@ export const getHoneypots = async () => {
 
 export const getHoneytrapLogs = async (username: string) => {
   const response = await axios.get(`/honeytrap/logs/${username}`);
-  return response.data;
+  return response.data.items;
 };
 
 export const getDetectedUsers = async () => {
   const response = await axios.get('/honeytrap/detected');
-  return response.data;
+  return response.data.items;
 };
 
 export const getHoneytrapStatistics = async () => {
   const response = await axios.get('/honeytrap/statistics');
   return response.data;
-};
\ No newline at end of file
+};
+export const getHoneytrapTimeseries = async (key: string, dimension = 'honeytrap', start?: string, end?: string) => {
+  const response = await axios.get('/honeytrap/timeseries', { params: { key, dimension, start, end } });
+  return response.data;
+};